@@ -6,19 +6,47 @@ LeanFocus - タスクトレイ常駐型ポモドーロタイマー
 
 import threading
 import time
+STARTUP_T0 = time.perf_counter()  # 起動プロファイル用の基準時刻
+import heapq
+import itertools
+import bisect
+import math
+import traceback
 import json
 import os
+import queue
+from collections import Counter, OrderedDict, namedtuple
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import hashlib
+import hmac
+import secrets
+import wave
+import array
+import operator
+import importlib.util
+import signal
+import socket
 import subprocess
 import sys
 import tkinter as tk
 from tkinter import ttk
 import ctypes
 import locale
+import struct
+import mmap
+
+# 制御ソケットの取り決め（leanfocusctl.py と共有）
+import leanfocus_control
+from leanfocus_control import control_address
 
 # サードパーティ製ライブラリ
-from PIL import Image
-import pystray
-import pygame
+# pygame / PIL / pystray は起動を速くするため、実際に必要になった時点で読み込む
+pygame = None
+numpy = None  # 任意。あれば統計の期間集計をベクトル演算で行う
+
+STARTUP_IMPORTS_DONE = time.perf_counter()
 
 # --- Windowsの高DPIスケーリング対応 ---
 try:
@@ -33,6 +61,20 @@ except (AttributeError, OSError):
 # グローバル設定・定数
 # =========================================
 CONFIG_FILE = 'LeanFocus_config.json'
+SUSPEND_GAP_THRESHOLD = 5.0  # 期限をこれ以上（秒）過ぎて起きたらスリープ復帰とみなす
+SUSPEND_POLICIES = ("catch_up", "pause")  # 復帰時: 正しいフェーズまで進める / 次のフェーズの頭で一時停止
+CONFIG_SAVE_INTERVAL = 1.0  # 設定ファイルの最短書き込み間隔（秒）
+SLIDER_PREVIEW_FPS = 30  # スライダー操作中にプレビューを反映する最大回数（回/秒）
+STARTUP_PROFILE_FILE = 'LeanFocus_startup_profile.json'
+TRACE_FILE = 'LeanFocus_trace.jsonl'
+TRACE_MAX_BYTES = 5 * 1024 * 1024  # トレースファイルのローテーションサイズ
+METRICS_FILE = 'LeanFocus_metrics.json'
+HISTORY_DIR = 'LeanFocus_history'  # セッション履歴（月ごとのバイナリログ）
+HISTORY_MAX_BYTES = 1024 * 1024  # 履歴ファイル1つあたりの上限（超えたら同じ月の次のファイルへ）
+HISTORY_FSYNC_INTERVAL = 5.0  # 履歴を fsync する最短間隔（秒）
+STATS_FILE = 'LeanFocus_stats.json'  # 日ごとの集計値
+CHECKPOINT_FILE = 'LeanFocus_checkpoint.json'  # 異常終了後に再開するためのタイマー状態
+CHECKPOINT_SAVE_INTERVAL = 2.0  # チェックポイントの最短書き込み間隔（秒）
 WORK_DURATION = 25 * 60  # 作業時間（秒）
 BREAK_DURATION = 5 * 60  # 休憩時間（秒）
 APP_NAME = "LeanFocus"
@@ -43,11 +85,35 @@ IMG_DIR = os.path.join(ASSET_DIR, "img")
 SOUND_DIR = os.path.join(ASSET_DIR, "sounds")
 ICON_FILE = os.path.join(IMG_DIR, "icon.png")
 SOUND_NAMES_FILE = os.path.join(SOUND_DIR, "sound_names.json")
+ASSET_MANIFEST_FILE = 'LeanFocus_assets.json'
+ASSET_WATCH_INTERVAL = 5.0  # 音源フォルダの変更を確認する間隔（秒）
+MENU_UPDATE_DELAY = 0.05  # トレイメニュー更新要求をまとめる待ち時間（秒）
 CREDITS_FILE = os.path.join(ASSET_DIR, "CREDITS.txt")
 
 # 対応する音声ファイル形式
 SUPPORTED_EXTENSIONS = ('.mp3', '.wav', '.ogg')
 
+# ミキサー形式に変換した音源のキャッシュ（非圧縮の音源だけが対象）
+TRANSCODE_DIR = 'LeanFocus_cache'
+TRANSCODE_EXTENSIONS = ('.wav',)
+
+# 音源ごとの音量差をならすときの基準ラウドネス（dBFS）。これより大きい音源だけを下げる
+LOUDNESS_TARGET_DB = -23.0
+
+# 内蔵ノイズ（ファイルを持たずに合成する音源）。available_noises 上のパスはこの接頭辞で区別する
+BUILTIN_NOISE_PREFIX = "builtin:"
+
+# デコード済み音声キャッシュの既定メモリ上限（MB）
+AUDIO_CACHE_BUDGET_MB = 256
+
+# 主音源に重ねて鳴らせる音源（レイヤー）の数の上限
+MAX_LAYERS = 4
+LAYER_RETRY_SEC = 0.25  # レイヤーの音源のデコード待ちを確認する間隔（秒）
+LAYER_RETRY_LIMIT = 40
+
+# フェーズ切り替え時のクロスフェード長の選択肢（秒, 0 = なし）
+CROSSFADE_CHOICES = (0, 0.5, 1.0, 2.0, 3.0)
+
 # =========================================
 # 言語・翻訳設定
 # =========================================
@@ -56,6 +122,14 @@ TRANSLATIONS = {
         "settings_title": "設定",
         "sound_sec": "サウンド設定",
         "volume": "音量調整",
+        "crossfade": "クロスフェード",
+        "normalize_loudness": "音源ごとの音量差をそろえる",
+        "layers": "重ねる音源",
+        "overlay_image": "文字を画像キャッシュで描画する（PIL）",
+        "add_layer": "＋ 音源を重ねる",
+        "suspend_policy": "スリープ復帰時",
+        "suspend_catch_up": "経過時間分進める",
+        "suspend_pause": "一時停止する",
         "visual_sec": "表示設定 (タイマー)",
         "size": "サイズ調整",
         "opacity": "不透明度",
@@ -64,10 +138,25 @@ TRANSLATIONS = {
         "work_noise": "作業用ノイズ",
         "break_noise": "休憩用ノイズ",
         "none": "なし",
+        "noise_white": "ホワイトノイズ（内蔵）",
+        "noise_pink": "ピンクノイズ（内蔵）",
+        "noise_brown": "ブラウンノイズ（内蔵）",
         "stop_timer": "タイマーを停止",
         "show_timer": "タイマーを表示",
+        "tray_progress": "アイコンに進捗を表示",
         "settings_menu": "設定...",
         "credits": "クレジット",
+        "dump_metrics": "計測データを書き出す",
+        "stats_menu": "統計...",
+        "stats_title": "統計",
+        "stats_today": "今日",
+        "stats_week": "今週",
+        "stats_month": "今月",
+        "stats_year": "過去1年",
+        "stats_focus": "集中（分）",
+        "stats_done": "完了",
+        "stats_rate": "完了率",
+        "stats_pauses": "一時停止/回",
         "quit": "アプリを終了",
         "state_stopped": "STOP",
         "state_work": "WORK",   # 英語表記のままの方がスタイリッシュなため変更
@@ -89,6 +178,14 @@ TRANSLATIONS = {
         "settings_title": "Settings",
         "sound_sec": "Sound Settings",
         "volume": "Volume",
+        "crossfade": "Crossfade",
+        "normalize_loudness": "Even out loudness between sounds",
+        "layers": "Layers",
+        "overlay_image": "Draw the timer from cached glyph images (PIL)",
+        "add_layer": "+ Add Layer",
+        "suspend_policy": "After Sleep",
+        "suspend_catch_up": "Catch up",
+        "suspend_pause": "Pause",
         "visual_sec": "Timer Appearance",
         "size": "Size",
         "opacity": "Opacity",
@@ -97,10 +194,25 @@ TRANSLATIONS = {
         "work_noise": "Work Noise",
         "break_noise": "Break Noise",
         "none": "None",
+        "noise_white": "White Noise (built-in)",
+        "noise_pink": "Pink Noise (built-in)",
+        "noise_brown": "Brown Noise (built-in)",
         "stop_timer": "Stop Timer",
         "show_timer": "Show Timer",
+        "tray_progress": "Show Progress in Icon",
         "settings_menu": "Settings...",
         "credits": "Credits",
+        "dump_metrics": "Dump Metrics",
+        "stats_menu": "Statistics...",
+        "stats_title": "Statistics",
+        "stats_today": "Today",
+        "stats_week": "This Week",
+        "stats_month": "This Month",
+        "stats_year": "Last 12 Months",
+        "stats_focus": "Focus (min)",
+        "stats_done": "Completed",
+        "stats_rate": "Completion",
+        "stats_pauses": "Pauses / Session",
         "quit": "Quit",
         "state_stopped": "STOP",
         "state_work": "WORK",
@@ -137,9 +249,264 @@ def tr(key):
     return TRANSLATIONS[CURRENT_LANG].get(key, key)
 
 
+# =========================================
+# 起動プロファイル (--profile-startup)
+# =========================================
+class StartupProfiler:
+    """
+    起動時の import・初期化の各フェーズの所要時間を記録する。
+    トレイ・オーバーレイ・音源スキャンが揃った時点で結果を書き出し、
+    その後のフェーズ（初回再生時の pygame 読み込みなど）は追記して書き直す。
+    """
+    MILESTONES = ("tray_visible", "overlay_ready", "assets_ready")
+
+    def __init__(self):
+        self.enabled = False
+        self._phases = []  # (name, start, end, thread_name)
+        self._marks = {}
+        self._lock = threading.Lock()
+        self._reported = False
+        self._printed = 0
+
+    def enable(self):
+        self.enabled = True
+        self._add_phase("import:stdlib+tkinter", STARTUP_T0, STARTUP_IMPORTS_DONE)
+
+    def phase(self, name):
+        """with 文で囲んだ区間の所要時間を記録する（無効時は何もしない）"""
+        if not self.enabled: return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add_phase(name, start, time.perf_counter())
+
+    def mark(self, name):
+        """起動からの経過時間でマイルストーンを記録する"""
+        if not self.enabled: return
+        with self._lock:
+            self._marks.setdefault(name, time.perf_counter())
+        self._maybe_report()
+
+    def _add_phase(self, name, start, end):
+        with self._lock:
+            self._phases.append((name, start, end, threading.current_thread().name))
+        self._maybe_report()
+
+    def _maybe_report(self):
+        with self._lock:
+            if not self._reported and not all(m in self._marks for m in self.MILESTONES): return
+            self._reported = True
+            report = {
+                "total_ms": round((max(self._marks.values()) - STARTUP_T0) * 1000, 2),
+                "phases": [
+                    {"name": name, "start_ms": round((start - STARTUP_T0) * 1000, 2),
+                     "duration_ms": round((end - start) * 1000, 2), "thread": thread}
+                    for name, start, end, thread in self._phases
+                ],
+                "marks": {name: round((t - STARTUP_T0) * 1000, 2) for name, t in self._marks.items()},
+            }
+            first_report = self._printed == 0
+            new_phases = report["phases"][self._printed:]
+            self._printed = len(report["phases"])
+        try:
+            write_file_atomic(STARTUP_PROFILE_FILE, json.dumps(report, indent=4))
+        except OSError: pass
+        # PyInstaller の windowed ビルドでは標準出力がないため、ファイル出力を正とする
+        if sys.stdout:
+            lines = [f"{p['name']:<28} {p['start_ms']:>9.1f} ms  +{p['duration_ms']:.1f} ms  [{p['thread']}]" for p in new_phases]
+            if first_report:
+                lines += [f"{name:<28} {t:>9.1f} ms" for name, t in report["marks"].items()]
+            print("\n".join(lines), flush=True)
+
+PROFILER = StartupProfiler()
+
+# =========================================
+# 計測 (instrumentation)
+# =========================================
+class Metrics:
+    """
+    ホットパスの所要時間を記録するオプトインの計測器。
+    無効時は start() / stop() が即座に戻るだけなので、呼び出し側のコストはほぼゼロ。
+    有効時はメトリクスごとのヒストグラムを集計し、生データを JSONL のトレースに書き出す。
+    """
+    # ヒストグラムのバケット上限（ミリ秒）
+    BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._histograms = {}  # name -> {"count", "sum", "min", "max", "buckets"}
+        self._pending = []
+        self._cond = threading.Condition(self._lock)
+        self._thread = None
+        self._running = False
+
+    def enable(self):
+        if self.enabled: return
+        self.enabled = True
+        self._running = True
+        self._thread = threading.Thread(target=self._run_writer, name="LeanFocusTrace", daemon=True)
+        self._thread.start()
+
+    def start(self) -> float:
+        """計測開始時刻を返す（無効時は 0.0）"""
+        return time.perf_counter() if self.enabled else 0.0
+
+    def stop(self, name, t0, **fields):
+        """start() からの経過時間を name として記録する"""
+        if not self.enabled: return
+        self.record(name, time.perf_counter() - t0, **fields)
+
+    def record(self, name, seconds, **fields):
+        """値（秒）をヒストグラムとトレースに記録する"""
+        if not self.enabled: return
+        ms = seconds * 1000
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = self._histograms[name] = {
+                    "count": 0, "sum": 0.0, "min": ms, "max": ms,
+                    "buckets": [0] * (len(self.BUCKETS_MS) + 1),
+                }
+            hist["count"] += 1
+            hist["sum"] += ms
+            hist["min"] = min(hist["min"], ms)
+            hist["max"] = max(hist["max"], ms)
+            hist["buckets"][bisect.bisect_left(self.BUCKETS_MS, ms)] += 1
+            fields.update(t=round(time.time(), 3), name=name, ms=round(ms, 3))
+            self._pending.append(fields)
+
+    def snapshot(self) -> dict:
+        """集計済みのヒストグラムを返す"""
+        labels = [f"<={b}ms" for b in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+        with self._lock:
+            return {
+                name: {
+                    "count": h["count"], "mean_ms": round(h["sum"] / h["count"], 3),
+                    "min_ms": round(h["min"], 3), "max_ms": round(h["max"], 3),
+                    "histogram": {label: n for label, n in zip(labels, h["buckets"]) if n},
+                }
+                for name, h in sorted(self._histograms.items())
+            }
+
+    def dump(self, path=METRICS_FILE) -> str:
+        """ヒストグラムをファイルに書き出し、そのパスを返す"""
+        write_file_atomic(path, json.dumps(self.snapshot(), indent=4))
+        return path
+
+    def close(self):
+        """トレースの書き込みスレッドを止め、未書き込みの記録を書き出す"""
+        if self._thread is None: return
+        with self._cond:
+            self.enabled = self._running = False
+            self._cond.notify()
+        self._thread.join()
+        self._thread = None
+
+    def _run_writer(self):
+        while True:
+            with self._cond:
+                if self._running:
+                    self._cond.wait(self.FLUSH_INTERVAL)
+                records, self._pending = self._pending, []
+                running = self._running
+            self._write_trace(records)
+            if not running: return
+
+    @staticmethod
+    def _write_trace(records):
+        if not records: return
+        try:
+            if os.path.exists(TRACE_FILE) and os.path.getsize(TRACE_FILE) > TRACE_MAX_BYTES:
+                os.replace(TRACE_FILE, TRACE_FILE + ".1")
+            with open(TRACE_FILE, 'a', encoding='utf-8') as f:
+                f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+        except OSError: pass
+
+METRICS = Metrics()
+
+def _import_numpy():
+    """NumPy があれば初回利用時に読み込む（なければ None）"""
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as _numpy
+            numpy = _numpy
+        except ImportError:
+            numpy = False
+    return numpy or None
+
+def _import_pygame():
+    """pygame を初回利用時に読み込む"""
+    global pygame
+    if pygame is None:
+        with PROFILER.phase("import:pygame"):
+            import pygame as _pygame
+        pygame = _pygame
+    return pygame
+
+# 残り時間表示用 "MM:SS" 文字列の事前計算テーブル
+TIME_TEXTS = tuple(map(leanfocus_control.format_time, range(max(WORK_DURATION, BREAK_DURATION) + 1)))
+
+def format_time(seconds):
+    """秒数を "MM:SS" 形式にする（テーブル範囲外のみ都度フォーマット）"""
+    seconds = max(0, seconds)
+    if seconds < len(TIME_TEXTS):
+        return TIME_TEXTS[seconds]
+    return leanfocus_control.format_time(seconds)
+
+
 # =========================================
 # クラス定義: 設定ウィンドウ
 # =========================================
+class SliderPreview:
+    """
+    スライダーの変化をまとめて反映する。ドラッグ中は最大 fps 回/秒だけ preview を呼び、
+    離したとき（またはウィンドウを閉じたとき）に最後の値で commit を呼んで確定・保存する。
+    Scale の command に渡して使う。
+    """
+    def __init__(self, scale, preview, commit, fps=SLIDER_PREVIEW_FPS):
+        self.scale = scale
+        self.preview = preview
+        self.commit = commit
+        self.interval_ms = max(1, int(1000 / fps))
+        self._after_id = None
+        self._dirty = False  # 次のフレームで preview すべき変化がある
+        self._uncommitted = False  # 最後の commit 以降に変化がある（フレームの予約とは独立）
+        scale.bind("<ButtonRelease-1>", self.finish, add="+")
+        scale.bind("<KeyRelease>", self.finish, add="+")
+
+    def __call__(self, value=None):
+        self._dirty = True
+        self._uncommitted = True
+        # 最初の変化はすぐに反映し、以降は間隔内の変化を1回にまとめる
+        if self._after_id is None:
+            self._flush()
+
+    def _flush(self):
+        self._after_id = None
+        if not self._dirty: return
+        self._dirty = False
+        self.preview()
+        self._after_id = self.scale.after(self.interval_ms, self._flush)
+
+    def finish(self, event=None):
+        """最後の値を確定する（変化がなければ何もしない）"""
+        if self._after_id is not None:
+            self.scale.after_cancel(self._after_id)
+            self._after_id = None
+        self._dirty = False
+        if self._uncommitted:
+            self._uncommitted = False
+            self.commit()
+
+
 class ConfigWindow(tk.Toplevel):
     """
     設定画面クラス。
@@ -148,6 +515,10 @@ class ConfigWindow(tk.Toplevel):
         super().__init__(parent)
         self.timer_window = timer_window
         self.app = timer_window.timer_app
+        # スライダーのプレビュー（閉じるときに確定する）
+        self.preview_fps = self.app.config.get("slider_preview_fps", SLIDER_PREVIEW_FPS)
+        self.sliders = []
+        self.layer_sliders = {"work": [], "break": []}
         
         self.title(tr("settings_title"))
         
@@ -209,6 +580,8 @@ class ConfigWindow(tk.Toplevel):
         self.combo_work.current(work_idx)
         self.combo_work.pack(fill='x', pady=(0, 10))
         self.combo_work.bind("<<ComboboxSelected>>", lambda e: self.on_sound_change("work"))
+        self.layer_frames = {"work": ttk.Frame(main_frame)}
+        self.layer_frames["work"].pack(fill='x', pady=(0, 10))
 
         ttk.Label(main_frame, text=tr("break_noise")).pack(anchor='w')
         current_break = self.app.config.get("break_noise", "None")
@@ -218,30 +591,74 @@ class ConfigWindow(tk.Toplevel):
         self.combo_break.current(break_idx)
         self.combo_break.pack(fill='x', pady=(0, 10))
         self.combo_break.bind("<<ComboboxSelected>>", lambda e: self.on_sound_change("break"))
+        self.layer_frames["break"] = ttk.Frame(main_frame)
+        self.layer_frames["break"].pack(fill='x', pady=(0, 10))
+        self.display_values = display_values
+        for noise_type in self.layer_frames:
+            self.render_layers(noise_type)
 
         ttk.Label(main_frame, text=tr("volume")).pack(anchor='w')
         self.volume_var = tk.DoubleVar(value=self.app.config.get("volume", 1.0))
-        scale_vol = ttk.Scale(main_frame, from_=0.0, to=1.0, variable=self.volume_var, command=self.on_volume_change)
+        scale_vol = ttk.Scale(main_frame, from_=0.0, to=1.0, variable=self.volume_var)
+        scale_vol.config(command=self._slider(scale_vol, lambda: self.on_volume_change(save=False), self.on_volume_change))
         scale_vol.pack(fill='x', pady=(0, 5))
 
+        self.normalize_var = tk.BooleanVar(value=self.app.config.get("normalize_loudness", True))
+        ttk.Checkbutton(main_frame, text=tr("normalize_loudness"), variable=self.normalize_var,
+                        command=lambda: self.app.set_normalize_loudness(self.normalize_var.get())).pack(anchor='w', pady=(0, 5))
+
+        ttk.Label(main_frame, text=tr("crossfade")).pack(anchor='w')
+        current_fade = self.app.config.get("crossfade_sec", 0)
+        fade_idx = CROSSFADE_CHOICES.index(current_fade) if current_fade in CROSSFADE_CHOICES else 0
+        fade_values = [tr("none") if sec == 0 else f"{sec:g}s" for sec in CROSSFADE_CHOICES]
+
+        self.combo_fade = ttk.Combobox(main_frame, values=fade_values, state="readonly")
+        self.combo_fade.current(fade_idx)
+        self.combo_fade.pack(fill='x', pady=(0, 5))
+        self.combo_fade.bind("<<ComboboxSelected>>", lambda e: self.on_crossfade_change())
+
+        ttk.Label(main_frame, text=tr("suspend_policy")).pack(anchor='w')
+        current_policy = self.app.config.get("suspend_policy", "catch_up")
+        self.combo_suspend = ttk.Combobox(main_frame, values=[tr(f"suspend_{p}") for p in SUSPEND_POLICIES], state="readonly")
+        self.combo_suspend.current(SUSPEND_POLICIES.index(current_policy) if current_policy in SUSPEND_POLICIES else 0)
+        self.combo_suspend.pack(fill='x', pady=(0, 5))
+        self.combo_suspend.bind("<<ComboboxSelected>>", lambda e: self.app.set_suspend_policy(SUSPEND_POLICIES[self.combo_suspend.current()]))
+
         ttk.Separator(main_frame, orient='horizontal').pack(fill='x', pady=15)
 
         ttk.Label(main_frame, text=tr("visual_sec"), font=("", 10, "bold")).pack(anchor='w', pady=(0, 10))
 
         ttk.Label(main_frame, text=tr("size")).pack(anchor='w')
         self.size_var = tk.DoubleVar(value=timer_window.font_size)
-        scale_size = ttk.Scale(main_frame, from_=6, to=72, variable=self.size_var, command=self.on_visual_change)
+        scale_size = ttk.Scale(main_frame, from_=6, to=72, variable=self.size_var)
+        scale_size.config(command=self._slider(scale_size, lambda: self.on_visual_change(save=False), self.on_visual_change))
         scale_size.pack(fill='x', pady=(0, 10))
 
         ttk.Label(main_frame, text=tr("opacity")).pack(anchor='w')
         self.alpha_var = tk.DoubleVar(value=timer_window.opacity)
-        scale_alpha = ttk.Scale(main_frame, from_=0.1, to=1.0, variable=self.alpha_var, command=self.on_visual_change)
+        scale_alpha = ttk.Scale(main_frame, from_=0.1, to=1.0, variable=self.alpha_var)
+        scale_alpha.config(command=self._slider(scale_alpha, lambda: self.on_visual_change(save=False), self.on_visual_change))
         scale_alpha.pack(fill='x', pady=(0, 5))
 
+        self.renderer_var = tk.BooleanVar(value=timer_window.image_renderer is not None)
+        ttk.Checkbutton(main_frame, text=tr("overlay_image"), variable=self.renderer_var,
+                        command=self.on_renderer_change).pack(anchor='w', pady=(5, 0))
+
         ttk.Label(main_frame, text=tr("window_hint"), font=("", 8), foreground="gray").pack(pady=(5, 0))
 
         ttk.Button(main_frame, text=tr("close"), command=self.destroy).pack(side='bottom', anchor='e', pady=10)
 
+    def _slider(self, scale, preview, commit, sliders=None) -> SliderPreview:
+        slider = SliderPreview(scale, preview, commit, self.preview_fps)
+        (self.sliders if sliders is None else sliders).append(slider)
+        return slider
+
+    def destroy(self):
+        # ドラッグ中に閉じられても最後の値を反映・保存する
+        for slider in self.sliders + self.layer_sliders["work"] + self.layer_sliders["break"]:
+            slider.finish()
+        super().destroy()
+
     def on_sound_change(self, noise_type):
         if noise_type == "work":
             idx = self.combo_work.current()
@@ -251,11 +668,242 @@ class ConfigWindow(tk.Toplevel):
             key = self.sound_keys[idx]
         self.app.set_noise_config(noise_type, key)
 
-    def on_visual_change(self, event=None):
-        self.timer_window.apply_visual_settings(self.size_var.get(), self.alpha_var.get())
+    def render_layers(self, noise_type):
+        """主音源に重ねる音源の一覧（音源・音量・削除）を作り直す"""
+        frame = self.layer_frames[noise_type]
+        for slider in self.layer_sliders[noise_type]:
+            slider.finish()
+        self.layer_sliders[noise_type] = []
+        for child in frame.winfo_children():
+            child.destroy()
+        layers = self.app.config.get(f"{noise_type}_layers", [])
+        if layers:
+            ttk.Label(frame, text=tr("layers"), font=("", 8), foreground="gray").pack(anchor='w')
+        for index, layer in enumerate(layers):
+            row = ttk.Frame(frame)
+            row.pack(fill='x', pady=(0, 2))
+            combo = ttk.Combobox(row, values=self.display_values, state="readonly", width=14)
+            combo.current(self.sound_keys.index(layer["noise"]) if layer["noise"] in self.sound_keys else 0)
+            combo.pack(side='left')
+            combo.bind("<<ComboboxSelected>>",
+                       lambda e, i=index, c=combo: self.app.set_layer_noise(noise_type, i, self.sound_keys[c.current()]))
+            gain_var = tk.DoubleVar(value=layer["gain"])
+            scale = ttk.Scale(row, from_=0.0, to=1.0, variable=gain_var)
+            scale.config(command=self._slider(
+                scale,
+                lambda i=index, v=gain_var: self.app.set_layer_gain(noise_type, i, v.get(), save=False),
+                lambda i=index, v=gain_var: self.app.set_layer_gain(noise_type, i, v.get()),
+                self.layer_sliders[noise_type]))
+            scale.pack(side='left', fill='x', expand=True, padx=5)
+            ttk.Button(row, text="×", width=2, command=lambda i=index: self.on_remove_layer(noise_type, i)).pack(side='right')
+        if len(layers) < MAX_LAYERS:
+            ttk.Button(frame, text=tr("add_layer"), command=lambda: self.on_add_layer(noise_type)).pack(anchor='w')
+
+    def on_add_layer(self, noise_type):
+        self.app.add_layer(noise_type)
+        self.render_layers(noise_type)
+
+    def on_remove_layer(self, noise_type, index):
+        self.app.remove_layer(noise_type, index)
+        self.render_layers(noise_type)
+
+    def on_crossfade_change(self):
+        self.app.set_crossfade(CROSSFADE_CHOICES[self.combo_fade.current()])
+
+    def on_visual_change(self, save=True):
+        self.timer_window.apply_visual_settings(self.size_var.get(), self.alpha_var.get(), save=save)
+
+    def on_renderer_change(self):
+        self.timer_window.set_renderer("image" if self.renderer_var.get() else "label")
+        # PIL が無ければ Label のままになる
+        self.renderer_var.set(self.timer_window.image_renderer is not None)
+
+    def on_volume_change(self, save=True):
+        self.app.set_volume(self.volume_var.get(), save=save)
+
+
+# =========================================
+# クラス定義: 統計ウィンドウ
+# =========================================
+class StatsWindow(tk.Toplevel):
+    """
+    集中時間・完了率・一時停止回数を期間ごとに表示する画面。
+    """
+    PERIODS = ("today", "week", "month", "year")
+
+    def __init__(self, parent, stats):
+        super().__init__(parent)
+        self.stats = stats
+        self.title(tr("stats_title"))
+        self.resizable(False, False)
+        self.attributes("-topmost", True)
 
-    def on_volume_change(self, event=None):
-        self.app.set_volume(self.volume_var.get())
+        main_frame = ttk.Frame(self, padding="20")
+        main_frame.pack(fill="both", expand=True)
+
+        columns = ("stats_focus", "stats_done", "stats_rate", "stats_pauses")
+        for col, key in enumerate(columns, start=1):
+            ttk.Label(main_frame, text=tr(key), font=("", 9, "bold")).grid(row=0, column=col, padx=8, pady=(0, 6), sticky='e')
+
+        now = time.time()
+        for row, period in enumerate(self.PERIODS, start=1):
+            if period == "year":
+                result = stats.query(now - 365 * 86400, now)
+            else:
+                result = stats.summary(period, now)
+            ttk.Label(main_frame, text=tr(f"stats_{period}")).grid(row=row, column=0, sticky='w', pady=2)
+            values = (
+                f"{result['focus_min']:.0f}",
+                str(result["completed"]),
+                "-" if result["completion_rate"] is None else f"{result['completion_rate']:.0%}",
+                "-" if result["pauses_per_session"] is None else f"{result['pauses_per_session']:.1f}",
+            )
+            for col, text in enumerate(values, start=1):
+                ttk.Label(main_frame, text=text).grid(row=row, column=col, padx=8, sticky='e')
+
+        ttk.Button(main_frame, text=tr("close"), command=self.destroy).grid(
+            row=len(self.PERIODS) + 1, column=0, columnspan=len(columns) + 1, sticky='e', pady=(12, 0))
+
+
+# =========================================
+# クラス定義: オーバーレイの画像レンダラー（グリフキャッシュ）
+# =========================================
+BOLD_FONT_FILES = ("segoeuib.ttf", "DejaVuSans-Bold.ttf", "Arial Bold.ttf", "arialbd.ttf")
+
+def load_bold_font(ImageFont, px):
+    """Segoe UI Bold に近い太字フォントを探して読み込む（見つからなければ PIL の既定フォント）"""
+    for name in BOLD_FONT_FILES:
+        try:
+            return ImageFont.truetype(name, px)
+        except OSError: continue
+    try:
+        return ImageFont.load_default(px)
+    except TypeError:
+        return ImageFont.load_default()  # Pillow 10.1 より前はサイズを指定できない
+
+
+class OverlayImageRenderer:
+    """
+    オーバーレイを Label の代わりに1枚の画像で描くレンダラー（PIL が必要）。
+    数字・コロン・状態名はフォントサイズと色ごとに一度だけラスタライズしてタイルとして持ち、
+    数字以外を貼った背景もレイアウトごとに保持する。毎秒の更新は背景の複製に数字のタイルを
+    貼って PhotoImage に書き込むだけで、Tk にフォントの計測やレイアウトをさせない。
+    数字は最も広い数字の幅のセルに置くので、フェーズ中は画像（ウィンドウ）の大きさが変わらない。
+    """
+    DIGITS = "0123456789"
+    FIXED = DIGITS + ":-"  # 毎秒貼り替える文字
+    MAX_BACKGROUNDS = 16
+
+    def __init__(self, canvas=None, px_per_point=1.0):
+        with PROFILER.phase("import:PIL"):
+            from PIL import Image, ImageDraw, ImageFont
+        self.Image, self.ImageDraw, self.ImageFont = Image, ImageDraw, ImageFont
+        self.canvas = canvas
+        self.px_per_point = px_per_point
+        self._fonts = {}
+        self._advances = {}  # (文字列, ピクセルサイズ) -> 幅
+        self._tiles = {}  # (文字列, ピクセルサイズ, 色) -> 画像
+        self._backgrounds = {}  # (画像サイズ, 数字以外の配置) -> 背景画像
+        self._photo = None
+        self._item = None
+        self.size = None  # 表示中の画像の大きさ
+
+    def clear(self):
+        """フォントサイズが変わったときにタイルと背景を捨てる"""
+        self._fonts.clear()
+        self._advances.clear()
+        self._tiles.clear()
+        self._backgrounds.clear()
+
+    def pixels(self, points) -> int:
+        return max(1, round(points * self.px_per_point))
+
+    def font(self, px):
+        font = self._fonts.get(px)
+        if font is None:
+            font = self._fonts[px] = load_bold_font(self.ImageFont, px)
+        return font
+
+    def line_height(self, px) -> int:
+        ascent, descent = self.font(px).getmetrics()
+        return ascent + descent
+
+    def advance(self, text, px) -> int:
+        """text を置いたときの幅。数字は最も広い数字の幅にそろえる"""
+        key = (text, px)
+        width = self._advances.get(key)
+        if width is None:
+            font = self.font(px)
+            if text in self.DIGITS:
+                width = max(math.ceil(font.getlength(d)) for d in self.DIGITS)
+            else:
+                width = math.ceil(font.getlength(text))
+            self._advances[key] = width
+        return width
+
+    def tile(self, text, px, color):
+        key = (text, px, color)
+        tile = self._tiles.get(key)
+        if tile is None:
+            font = self.font(px)
+            width = self.advance(text, px)
+            tile = self.Image.new("RGB", (max(1, width), self.line_height(px)), "black")
+            x = (width - math.ceil(font.getlength(text))) // 2
+            self.ImageDraw.Draw(tile).text((x, 0), text, font=font, fill=color)
+            self._tiles[key] = tile
+        return tile
+
+    def layout_line(self, text, px, color, x, y) -> tuple:
+        """1行分の配置 [(x, y, 文字列, px, 色), ...] と右端の x。数字・記号は1文字ずつ、それ以外は語ごとに置く"""
+        items, word = [], ""
+        for ch in text:
+            if ch not in self.FIXED:
+                word += ch
+                continue
+            if word:
+                items.append((x, y, word, px, color))
+                x += self.advance(word, px)
+                word = ""
+            items.append((x, y, ch, px, color))
+            x += self.advance(ch, px)
+        if word:
+            items.append((x, y, word, px, color))
+            x += self.advance(word, px)
+        return items, x
+
+    def compose(self, items, size):
+        """配置どおりにタイルを貼った画像を作る。数字以外は背景としてキャッシュする"""
+        static = tuple(item for item in items if item[2] not in self.FIXED)
+        key = (size, static)
+        background = self._backgrounds.get(key)
+        if background is None:
+            if len(self._backgrounds) >= self.MAX_BACKGROUNDS:
+                self._backgrounds.clear()
+            background = self.Image.new("RGB", size, "black")
+            for x, y, text, px, color in static:
+                background.paste(self.tile(text, px, color), (x, y))
+            self._backgrounds[key] = background
+        frame = background.copy()
+        for x, y, text, px, color in items:
+            if text in self.FIXED:
+                frame.paste(self.tile(text, px, color), (x, y))
+        return frame
+
+    def draw(self, items, size) -> bool:
+        """キャンバスの画像を書き換える。画像の大きさが変わったときは True"""
+        from PIL import ImageTk
+        frame = self.compose(items, size)
+        if self._photo is not None and self.size == size:
+            self._photo.paste(frame)
+            return False
+        self._photo = ImageTk.PhotoImage(frame, master=self.canvas)
+        self.size = size
+        self.canvas.config(width=size[0], height=size[1])
+        if self._item is None:
+            self._item = self.canvas.create_image(0, 0, anchor="nw", image=self._photo)
+        else:
+            self.canvas.itemconfig(self._item, image=self._photo)
+        return True
 
 
 # =========================================
@@ -265,6 +913,23 @@ class FloatingTimer(tk.Tk):
     """
     常に最前面に表示される透過ウィンドウ。
     """
+    COLOR_WORK = "#9E9E9E"
+    COLOR_BREAK = "#80CBC4"
+    COLOR_PAUSE = "#FFF59D"
+    COLOR_STOP = "#FF8A80"
+
+    # 秒の境界ちょうどで起きると切り替わり前の値を読むことがあるため、少しだけ遅らせる
+    TICK_MARGIN_MS = 5
+    EVENT_POLL_MS = 100  # 他スレッドから届いたスナップショットを取りに行く間隔
+
+    # 画像レンダラー使用時の余白（Label の padx / pady に合わせる）
+    IMAGE_PAD = 5
+    RENDERERS = ("label", "image")
+
+    # イベントループ停止検出（計測有効時のみ）: 確認間隔とこれ以上遅れたら停止とみなす秒数
+    STALL_PROBE_MS = 100
+    STALL_THRESHOLD = 0.05
+
     def __init__(self, timer_app):
         super().__init__()
         self.timer_app = timer_app
@@ -280,6 +945,21 @@ class FloatingTimer(tk.Tk):
         # レイアウトモード管理
         self.is_pause_layout = False
 
+        # 描画済みの内容 (state, resume_state, time_text) と次回描画の予約
+        self._last_render = None
+        self._render_after_id = None
+        # 描画はイベントバスから受け取った最新のスナップショットだけを見る
+        self._snapshot = timer_app.events.latest
+        # 他スレッドからの通知はキューに入れるだけにして、Tk スレッドが取りに行く。
+        # 別スレッドからの after() は Tk スレッドの応答を待つので、互いに待ち合うおそれがある
+        self._inbox = queue.SimpleQueue()
+        self._tk_thread = threading.current_thread()
+        self.STATE_TEXTS = {
+            PomodoroTimer.STATE_WORK: (tr("state_work"), self.COLOR_WORK),
+            PomodoroTimer.STATE_BREAK: (tr("state_break"), self.COLOR_BREAK),
+            PomodoroTimer.STATE_STOPPED: (tr("state_stopped"), self.COLOR_STOP),
+        }
+
         # --- 通常時用のコンテナ (1行表示) ---
         self.frame_normal = tk.Frame(self, bg="black")
         self.label_normal = tk.Label(
@@ -331,6 +1011,10 @@ class FloatingTimer(tk.Tk):
         )
         self.label_pause_time.pack(side="right", fill="both", padx=(2, 5))
 
+        # --- 画像レンダラー用のキャンバス (overlay_renderer = "image") ---
+        self.canvas = tk.Canvas(self, bg="black", highlightthickness=0, bd=0)
+        self.image_renderer = None
+
         # 初期状態は通常フレームを表示
         self.frame_normal.pack(expand=True, fill='both')
         
@@ -351,7 +1035,8 @@ class FloatingTimer(tk.Tk):
             self,
             self.frame_normal, self.label_normal,
             self.frame_pause, self.frame_pause_left,
-            self.label_pause_status, self.label_pause_resume, self.label_pause_time
+            self.label_pause_status, self.label_pause_resume, self.label_pause_time,
+            self.canvas
         ]
         self._bind_events_to_all()
         
@@ -359,7 +1044,12 @@ class FloatingTimer(tk.Tk):
         self.y = 0
         self.is_visible = False
 
-        self.update_timer_display()
+        timer_app.events.subscribe(self.on_timer_event, dispatch=self._dispatch)
+        self.after(self.EVENT_POLL_MS, self._poll_events)
+        if timer_app.config.get("overlay_renderer", "label") == "image":
+            self.set_renderer("image", save=False)
+        else:
+            self.update_timer_display()
 
     def _bind_events_to_all(self):
         """定義済みの全ウィジェットにイベントをバインド"""
@@ -374,12 +1064,10 @@ class FloatingTimer(tk.Tk):
             except:
                 pass
 
-    def show_custom_menu(self, event):
-        """カスタムコンテキストメニューを表示"""
-        self.close_custom_menu()
-        self.is_menu_open = True
-
+    def _build_custom_menu(self):
+        """コンテキストメニューを一度だけ組み立てる。以降は表示・非表示と項目の出し分けだけを行う"""
         menu = tk.Toplevel(self)
+        menu.withdraw()
         menu.overrideredirect(True)
         menu.attributes("-topmost", True)
         
@@ -389,6 +1077,7 @@ class FloatingTimer(tk.Tk):
         
         menu.config(bg=bg_color, relief="solid", bd=1)
         self.menu_window = menu
+        self.menu_bg = bg_color
 
         def add_menu_item(text, command):
             item = tk.Label(
@@ -398,7 +1087,6 @@ class FloatingTimer(tk.Tk):
                 anchor="w", 
                 padx=12, pady=4
             )
-            item.pack(fill="x", padx=0, pady=0)
             
             def on_click(e):
                 command()
@@ -411,38 +1099,66 @@ class FloatingTimer(tk.Tk):
             item.bind("<Button-1>", on_click)
             item.bind("<Enter>", on_enter)
             item.bind("<Leave>", on_leave)
+            return item
 
         def add_separator():
             sep_frame = tk.Frame(menu, bg=bg_color, height=6)
-            sep_frame.pack(fill="x")
             sep = tk.Frame(sep_frame, height=1, bg="#555555")
             sep.place(relx=0.02, rely=0.5, relwidth=0.96, anchor="w")
+            return sep_frame
+
+        # 表示順に並べておき、開くたびに状態に応じて出し分ける
+        self.menu_items = {
+            "toggle": add_menu_item(tr("ctx_start"), self.toggle_timer_action),
+            "restart": add_menu_item(tr("ctx_restart"), self.timer_app.restart_and_pause),
+            "stop": add_menu_item(tr("ctx_stop"), self.timer_app.reset_timer),
+            "hide": add_menu_item(tr("ctx_hide"), self.timer_app.toggle_timer_display),
+            "separator": add_separator(),
+            "settings": add_menu_item(tr("settings_menu"), self.timer_app.open_config_window),
+        }
+        self.menu_visible_keys = None
+
+        def check_focus_out(e):
+            self.after(10, self._check_focus_and_close)
+        menu.bind("<FocusOut>", check_focus_out)
+        menu.bind("<Escape>", lambda e: self.close_custom_menu())
+
+    def show_custom_menu(self, event):
+        """カスタムコンテキストメニューを表示"""
+        self.close_custom_menu()
+        if self.menu_window is None:
+            self._build_custom_menu()
+        self.is_menu_open = True
+        menu = self.menu_window
 
         state = self.timer_app.state
+        running = state in [PomodoroTimer.STATE_WORK, PomodoroTimer.STATE_BREAK]
 
         # 1. 一時停止 / 再開 / 開始
-        if state in [PomodoroTimer.STATE_WORK, PomodoroTimer.STATE_BREAK]:
-            add_menu_item(tr("ctx_pause"), self.toggle_timer_action)
+        if running:
+            toggle_text = tr("ctx_pause")
         elif state == PomodoroTimer.STATE_PAUSED:
-            add_menu_item(tr("ctx_resume"), self.toggle_timer_action)
+            toggle_text = tr("ctx_resume")
         else:
-            add_menu_item(tr("ctx_start"), self.toggle_timer_action)
-
-        # 2. リスタート (作業中・休憩中のみ表示)
-        if state in [PomodoroTimer.STATE_WORK, PomodoroTimer.STATE_BREAK]:
-            add_menu_item(tr("ctx_restart"), self.timer_app.restart_and_pause)
-
-        # 3. 停止 (停止中以外)
-        if state != PomodoroTimer.STATE_STOPPED:
-            add_menu_item(tr("ctx_stop"), self.timer_app.reset_timer)
-
-        # 4. 隠す
-        add_menu_item(tr("ctx_hide"), self.timer_app.toggle_timer_display)
-
-        add_separator()
-
-        # 5. 設定
-        add_menu_item(tr("settings_menu"), self.timer_app.open_config_window)
+            toggle_text = tr("ctx_start")
+        self.menu_items["toggle"].config(text=toggle_text)
+
+        # 2. リスタート (作業中・休憩中のみ表示) / 3. 停止 (停止中以外) / 4. 隠す / 5. 設定
+        visible = {"toggle", "hide", "separator", "settings"}
+        if running: visible.add("restart")
+        if state != PomodoroTimer.STATE_STOPPED: visible.add("stop")
+
+        keys = tuple(key for key in self.menu_items if key in visible)
+        if keys != self.menu_visible_keys:
+            for widget in self.menu_items.values():
+                widget.pack_forget()
+            for key in keys:
+                self.menu_items[key].pack(fill="x", padx=0, pady=0)
+            self.menu_visible_keys = keys
+        # 閉じたときに <Leave> が届かずハイライトが残っている場合があるので戻す
+        for key in keys:
+            if key != "separator":
+                self.menu_items[key].config(bg=self.menu_bg)
 
         menu.update_idletasks()
         w = menu.winfo_reqwidth()
@@ -454,29 +1170,73 @@ class FloatingTimer(tk.Tk):
         if x + w > screen_w: x = screen_w - w
         if y + h > screen_h: y = screen_h - h
         menu.geometry(f"{w}x{h}+{x}+{y}")
+        menu.deiconify()
+        menu.lift()
 
         menu.focus_force()
-        def check_focus_out(e):
-            self.after(10, self._check_focus_and_close)
-        menu.bind("<FocusOut>", check_focus_out)
-        menu.bind("<Escape>", lambda e: self.close_custom_menu())
 
     def _check_focus_and_close(self):
-        if self.menu_window:
+        if self.is_menu_open and self.menu_window:
             focused = self.menu_window.focus_get()
             if focused != self.menu_window and focused not in self.menu_window.winfo_children():
                 self.close_custom_menu()
 
     def close_custom_menu(self):
-        if self.menu_window:
-            try: self.menu_window.destroy()
+        if self.menu_window and self.is_menu_open:
+            try: self.menu_window.withdraw()
             except: pass
-            self.menu_window = None
         self.is_menu_open = False
         self.lift()
         self.attributes("-topmost", True)
 
-    def refresh_layout(self):
+    def set_renderer(self, mode, save=True):
+        """描画方式を切り替える（"label": Tk の Label, "image": グリフキャッシュから作る画像）"""
+        self.image_renderer = None
+        if mode == "image":
+            try:
+                self.image_renderer = OverlayImageRenderer(self.canvas, self.winfo_fpixels("1p"))
+            except ImportError:
+                mode = "label"
+        for widget in (self.frame_normal, self.frame_pause, self.canvas):
+            widget.pack_forget()
+        if self.image_renderer: self.canvas.pack(expand=True, fill='both')
+        else:
+            self._apply_label_fonts()
+            self.frame_normal.pack(expand=True, fill='both')
+        self.is_pause_layout = False
+        self._last_render = None
+        if save:
+            self.timer_app.config["overlay_renderer"] = mode
+            self.timer_app.save_config()
+        self.update_timer_display()
+
+    def _draw_image(self, state, resume_st, time_text) -> bool:
+        """画像レンダラーで描く。画像の大きさが変わったときは True"""
+        r = self.image_renderer
+        pad = self.IMAGE_PAD
+        big = r.pixels(self.font_size)
+        big_h = r.line_height(big)
+        if state == PomodoroTimer.STATE_PAUSED:
+            # 左カラムに WORK/BREAK と PAUSE を2段で、右カラムに時間を置く
+            small = r.pixels(max(1, int(self.font_size * 0.55)))
+            small_h = r.line_height(small)
+            resume_text, resume_fg = self.STATE_TEXTS[PomodoroTimer.STATE_WORK if resume_st == PomodoroTimer.STATE_WORK
+                                                      else PomodoroTimer.STATE_BREAK]
+            pause_text = tr("state_paused")
+            height = max(2 * small_h, big_h) + 2 * pad
+            top = (height - 2 * small_h) // 2
+            items, _ = r.layout_line(resume_text, small, resume_fg, pad, top)
+            status, _ = r.layout_line(pause_text, small, self.COLOR_PAUSE, pad, top + small_h)
+            left_w = max(r.advance(resume_text, small), r.advance(pause_text, small))
+            time_items, right = r.layout_line(time_text, big, resume_fg, pad + left_w + 4, (height - big_h) // 2)
+            items += status + time_items
+        else:
+            st_text, fg = self.STATE_TEXTS.get(state, self.STATE_TEXTS[PomodoroTimer.STATE_STOPPED])
+            items, right = r.layout_line(tr("status_fmt").format(state=st_text, time=time_text), big, fg, pad, pad)
+            height = big_h + 2 * pad
+        return r.draw(items, (right + pad, height))
+
+    def _apply_label_fonts(self):
         base_font = ("Segoe UI", self.font_size, "bold")
         # 最小値を 8 ではなく 1 に変更し、計算上の比率を優先させる
         small_font = ("Segoe UI", max(1, int(self.font_size * 0.55)), "bold")
@@ -486,10 +1246,21 @@ class FloatingTimer(tk.Tk):
         self.label_pause_status.config(font=small_font)
         self.label_pause_resume.config(font=small_font)
 
+    def _window_size(self):
+        """ウィンドウに必要な大きさ。画像レンダラーでは画像の大きさをそのまま使い、Tk に計測させない"""
+        if self.image_renderer and self.image_renderer.size:
+            return self.image_renderer.size
         self.update_idletasks()
-        
-        win_w = self.winfo_reqwidth()
-        win_h = self.winfo_reqheight()
+        return self.winfo_reqwidth(), self.winfo_reqheight()
+
+    def refresh_layout(self):
+        if self.image_renderer:
+            self._last_render = None
+            self.update_timer_display()
+        else:
+            self._apply_label_fonts()
+
+        win_w, win_h = self._window_size()
         
         screen_width = self.winfo_screenwidth()
         screen_height = self.winfo_screenheight()
@@ -558,16 +1329,22 @@ class FloatingTimer(tk.Tk):
     def on_hover_leave(self, event):
         self.attributes("-alpha", self.opacity)
 
-    def apply_visual_settings(self, size, opacity):
-        self.font_size = int(float(size))
+    def apply_visual_settings(self, size, opacity, save=True):
+        font_size = int(float(size))
+        relayout = font_size != self.font_size
+        self.font_size = font_size
         self.opacity = float(opacity)
         self.attributes("-alpha", self.opacity)
         
-        self.refresh_layout()
+        # 透明度はウィンドウ全体にかかるので、透明度だけの変更ならグリフもレイアウトもそのまま使える
+        if relayout:
+            # タイルに焼き込むのはフォントと色だけ。フォントは固定、色はキーに含むのでサイズが変わったときだけ捨てる
+            if self.image_renderer: self.image_renderer.clear()
+            self.refresh_layout()
         
         self.timer_app.config["font_size"] = self.font_size
         self.timer_app.config["opacity"] = self.opacity
-        self.timer_app.save_config()
+        if save: self.timer_app.save_config()
 
     def toggle_visibility(self, show):
         if show:
@@ -576,150 +1353,1898 @@ class FloatingTimer(tk.Tk):
             self.refresh_layout()
             self.lift()
             self.attributes("-topmost", True)
+            self.update_timer_display()
         else:
             self.withdraw()
             self.is_visible = False
 
+    def _dispatch(self, callback, snapshot):
+        """イベントバスの通知を Tk スレッドに渡す（他スレッドから呼ばれても Tk には触れない）"""
+        if threading.current_thread() is self._tk_thread:
+            callback(snapshot)  # オーバーレイのクリックなどはその場で反映する
+        else:
+            self._inbox.put((callback, snapshot))
+
+    def _poll_events(self):
+        try:
+            while True:
+                callback, snapshot = self._inbox.get_nowait()
+                callback(snapshot)
+        except queue.Empty: pass
+        finally:
+            self.after(self.EVENT_POLL_MS, self._poll_events)
+
+    def on_timer_event(self, snapshot):
+        if snapshot.version < self._snapshot.version: return
+        self._snapshot = snapshot
+        self.update_timer_display()
+
     def update_timer_display(self):
-        state = self.timer_app.state
-        remaining = max(0, self.timer_app.remaining_time)
-        mins, secs = divmod(remaining, 60)
-        time_text = f"{mins:02d}:{secs:02d}"
-        
-        COLOR_WORK = "#9E9E9E"
-        COLOR_BREAK = "#80CBC4"
-        COLOR_PAUSE = "#FFF59D"
-        COLOR_STOP = "#FF8A80"
+        """表示内容が変わったときだけウィジェットを更新し、次の秒の境界で再実行する"""
+        if self._render_after_id:
+            self.after_cancel(self._render_after_id)
+            self._render_after_id = None
+
+        snapshot = self._snapshot
+        now = self.timer_app.engine.clock()
+        state = snapshot.state
+        resume_st = snapshot.resume_state if state == PomodoroTimer.STATE_PAUSED else None
+        if state == PomodoroTimer.STATE_STOPPED:
+            time_text = "--:--"
+        else:
+            time_text = format_time(snapshot.remaining_at(now))
+
+        render_key = (state, resume_st, time_text)
+        if render_key != self._last_render:
+            t0 = METRICS.start()
+            last = self._last_render
+            self._last_render = render_key
+            layout_changed = last is None or last[:2] != render_key[:2]
+
+            if self.image_renderer:
+                # 毎秒の更新は数字のタイルを貼り替えるだけ。ウィンドウサイズは画像の大きさが変わったときだけ合わせる
+                layout_changed = self._draw_image(state, resume_st, time_text)
+            elif state == PomodoroTimer.STATE_PAUSED:
+                if not self.is_pause_layout:
+                    self.frame_normal.pack_forget()
+                    self.frame_pause.pack(expand=True, fill='both')
+                    self.is_pause_layout = True
+
+                if resume_st == PomodoroTimer.STATE_WORK:
+                    resume_text, resume_fg = self.STATE_TEXTS[PomodoroTimer.STATE_WORK]
+                else:
+                    resume_text, resume_fg = self.STATE_TEXTS[PomodoroTimer.STATE_BREAK]
 
-        if state == PomodoroTimer.STATE_PAUSED:
-            if not self.is_pause_layout:
-                self.frame_normal.pack_forget()
-                self.frame_pause.pack(expand=True, fill='both')
-                self.is_pause_layout = True
+                if layout_changed:
+                    self.label_pause_resume.config(text=resume_text, fg=resume_fg)
+                    self.label_pause_status.config(text=tr("state_paused"), fg=self.COLOR_PAUSE)
+                    self.label_pause_time.config(text=time_text, fg=resume_fg)
+                else:
+                    self.label_pause_time.config(text=time_text)
 
-            resume_st = self.timer_app.resume_state
-            
-            if resume_st == PomodoroTimer.STATE_WORK:
-                resume_text = tr("state_work")
-                resume_fg = COLOR_WORK
             else:
-                resume_text = tr("state_break")
-                resume_fg = COLOR_BREAK
+                if self.is_pause_layout:
+                    self.frame_pause.pack_forget()
+                    self.frame_normal.pack(expand=True, fill='both')
+                    self.is_pause_layout = False
+
+                st_text, fg = self.STATE_TEXTS.get(state, self.STATE_TEXTS[PomodoroTimer.STATE_STOPPED])
+                display_text = tr("status_fmt").format(state=st_text, time=time_text)
+                if layout_changed:
+                    self.label_normal.config(text=display_text, fg=fg)
+                else:
+                    self.label_normal.config(text=display_text)
 
-            self.label_pause_resume.config(text=resume_text, fg=resume_fg)
-            self.label_pause_status.config(text=tr("state_paused"), fg=COLOR_PAUSE)
-            self.label_pause_time.config(text=time_text, fg=resume_fg) 
+            # 数字は等幅なので、サイズの再計算は状態やレイアウトが変わったときだけで良い
+            if layout_changed:
+                self._fit_window_size()
 
-        else:
-            if self.is_pause_layout:
-                self.frame_pause.pack_forget()
-                self.frame_normal.pack(expand=True, fill='both')
-                self.is_pause_layout = False
-
-            if state == PomodoroTimer.STATE_WORK:
-                st_text = tr("state_work")
-                fg = COLOR_WORK
-            elif state == PomodoroTimer.STATE_BREAK:
-                st_text = tr("state_break")
-                fg = COLOR_BREAK
-            else:
-                st_text = tr("state_stopped")
-                fg = COLOR_STOP
-                time_text = "--:--"
-            
-            display_text = f"{st_text}   {time_text}"
-            self.label_normal.config(text=display_text, fg=fg)
-        
-        self.update_idletasks()
-        req_w = self.winfo_reqwidth()
-        req_h = self.winfo_reqheight()
+            if self.is_visible and not self.is_menu_open:
+                self.attributes("-topmost", True)
+            METRICS.stop("overlay.render", t0, layout_changed=layout_changed)
+
+        # 計測中かつ表示中のみ、表示が次に変わる瞬間まで眠る
+        if self.is_visible and snapshot.running:
+            delay_ms = int(snapshot.next_tick_delay(now) * 1000) + self.TICK_MARGIN_MS
+            self._render_after_id = self.after(delay_ms, self._on_render_tick, time.perf_counter() + delay_ms / 1000)
+
+    def _on_render_tick(self, due):
+        self._render_after_id = None
+        if METRICS.enabled:
+            METRICS.record("overlay.tick_drift", time.perf_counter() - due)
+        self.update_timer_display()
+
+    def start_stall_probe(self, expected=None):
+        """計測有効時のみ、一定間隔の after の遅れから Tk イベントループの停止を検出する"""
+        now = time.perf_counter()
+        if expected is not None and now - expected > self.STALL_THRESHOLD:
+            METRICS.record("tk.stall", now - expected)
+        self.after(self.STALL_PROBE_MS, self.start_stall_probe, now + self.STALL_PROBE_MS / 1000)
+
+    def _fit_window_size(self):
+        req_w, req_h = self._window_size()
         if self.winfo_width() != req_w or self.winfo_height() != req_h:
              x = self.winfo_x()
              y = self.winfo_y()
              self.geometry(f"{req_w}x{req_h}+{x}+{y}")
 
-        if self.is_visible and not self.is_menu_open:
-            self.attributes("-topmost", True)
 
-        self.after(200, self.update_timer_display)
+# =========================================
+# クラス定義: デッドラインスケジューラ
+# =========================================
+def _make_phase_clock():
+    """
+    フェーズ計測用の単調増加時計を返す。
+    壁時計の変更 (NTP・手動変更) の影響を受けず、スリープ中の経過時間も含むものを選ぶ。
+    """
+    if sys.platform.startswith("linux") and hasattr(time, "CLOCK_BOOTTIME"):
+        return lambda: time.clock_gettime(time.CLOCK_BOOTTIME)
+    if sys.platform == "darwin" and hasattr(time, "CLOCK_MONOTONIC"):
+        # macOS の time.monotonic はスリープ中に止まるが、CLOCK_MONOTONIC は進み続ける
+        return lambda: time.clock_gettime(time.CLOCK_MONOTONIC)
+    # Windows の time.monotonic (GetTickCount64) はスリープ中も進む
+    return time.monotonic
+
+monotonic_clock = _make_phase_clock()
+
+
+class DeadlineScheduler:
+    """
+    期限(deadline)のヒープを持つ常駐スケジューラ。
+    次の期限が来るか、新しいコマンドが投入されるまでスレッドは眠り続ける。
+    """
+    # OS の待機タイムアウトはスリープ中に進まないことがあるため、1回の待機はこの秒数までに抑え、
+    # 復帰後の期限切れを取りこぼさないようにする。復帰から切り替えまでの遅れはこの秒数が上限になる
+    # （その間オーバーレイは 00:00 のまま止まって見えるので、数秒に留める）
+    MAX_SLEEP = 2.0
+
+    def __init__(self, clock=monotonic_clock):
+        self.clock = clock
+        self._heap = []
+        self._cancelled = set()
+        self._seq = itertools.count(1)
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="LeanFocusScheduler", daemon=True)
+        self._thread.start()
+
+    def call_at(self, deadline, callback, *args) -> int:
+        """指定時刻に callback を実行する。取り消し用のハンドルを返す"""
+        with self._cond:
+            handle = next(self._seq)
+            heapq.heappush(self._heap, (deadline, handle, callback, args))
+            self._cond.notify()
+        return handle
+
+    def call_soon(self, callback, *args) -> int:
+        """スケジューラスレッド上で callback をすぐに実行する"""
+        return self.call_at(self.clock(), callback, *args)
+
+    def call_later(self, delay, callback, *args) -> int:
+        """delay 秒後に callback を実行する"""
+        return self.call_at(self.clock() + delay, callback, *args)
+
+    def cancel(self, handle):
+        """未実行の予約を取り消す（実行済み・不明なハンドルは無視）"""
+        if not handle: return
+        with self._cond:
+            if any(entry[1] == handle for entry in self._heap):
+                self._cancelled.add(handle)
+                self._cond.notify()
+
+    def shutdown(self):
+        with self._cond:
+            self._running = False
+            self._heap.clear()
+            self._cancelled.clear()
+            self._cond.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._running: return
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    deadline, handle, callback, args = self._heap[0]
+                    if handle in self._cancelled:
+                        heapq.heappop(self._heap)
+                        self._cancelled.discard(handle)
+                        continue
+                    delay = deadline - self.clock()
+                    if delay > 0:
+                        self._cond.wait(min(delay, self.MAX_SLEEP))
+                        continue
+                    heapq.heappop(self._heap)
+                    break
+            try:
+                callback(*args)
+            except Exception:
+                traceback.print_exc()
 
 
 # =========================================
-# クラス定義: ポモドーロタイマー本体（ロジック）
+# クラス定義: 設定ファイルの非同期ライター
 # =========================================
-class PomodoroTimer:
+def write_file_atomic(path, text):
+    """一時ファイルに書き込んでから置き換えることで、書き込み途中のファイルを残さない"""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except OSError:
+        try: os.remove(tmp_path)
+        except OSError: pass
+        raise
+
+
+class CoalescingWriter:
+    """
+    バックグラウンドでファイルを書き込むライター。
+    書き込み要求は最新の内容だけを保持し、interval 秒に最大1回だけ書き込む。
+    内容の代わりに文字列を返す関数を渡すと、シリアライズもライタースレッドで行う。
+    """
+    def __init__(self, path, interval=CONFIG_SAVE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._pending = None
+        self._last_write = 0.0
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="LeanFocusWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, text):
+        """書き込む内容を登録する（直前の未書き込み分は上書きされる）"""
+        with self._cond:
+            self._pending = text
+            self._cond.notify()
+
+    def flush(self):
+        """未書き込みの内容があれば呼び出し元スレッドで即座に書き込む"""
+        with self._cond:
+            text, self._pending = self._pending, None
+        if text is not None:
+            self._write(text)
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+
+    def _write(self, text):
+        with self._write_lock:
+            if callable(text): text = text()
+            try:
+                write_file_atomic(self.path, text)
+            except OSError: pass
+            self._last_write = time.monotonic()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    if self._pending is None:
+                        self._cond.wait()
+                        continue
+                    delay = self._last_write + self.interval - time.monotonic()
+                    if delay > 0:
+                        self._cond.wait(delay)
+                        continue
+                    break
+                else:
+                    return
+                text, self._pending = self._pending, None
+            self._write(text)
+
+
+# =========================================
+# クラス定義: セッション履歴ログ
+# =========================================
+class SessionLog:
+    """
+    セッションの開始・一時停止・再開・フェーズ完了・リセットを記録する追記専用ログ。
+    1イベント16バイトの固定長レコードをキューに積むだけで戻り、書き込みと fsync は
+    バックグラウンドスレッドがまとめて行う。ファイルは月ごと・サイズごとに分かれるため、
+    起動時に過去の履歴を読む必要はない。
+    """
+    MAGIC = b"LFHIST01"
+    RECORD = struct.Struct("<dBBxxf")  # 壁時計の時刻, イベント, フェーズ, 値（秒）
+    EVENTS = {"start": 1, "pause": 2, "resume": 3, "complete": 4, "reset": 5}
+    PHASES = {"STOP": 0, "WORK": 1, "BREAK": 2, "PAUSE": 3}
+
+    def __init__(self, directory=HISTORY_DIR, max_bytes=HISTORY_MAX_BYTES, fsync_interval=HISTORY_FSYNC_INTERVAL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fsync_interval = fsync_interval
+        self._pending = []
+        self._cond = threading.Condition()
+        self._running = True
+        self._file = None
+        self._segment = None
+        self._index = 0
+        self.listeners = []  # log_event() のたびに (時刻, イベント, フェーズ, 値) で呼ばれる
+        self._thread = threading.Thread(target=self._run, name="LeanFocusHistory", daemon=True)
+        self._thread.start()
+
+    def log_event(self, event, phase, value=0.0):
+        """イベントを記録する（呼び出し元スレッドではディスクに触れない）"""
+        t = time.time()
+        record = self.RECORD.pack(t, self.EVENTS[event], self.PHASES.get(phase, 0), value)
+        with self._cond:
+            self._pending.append(record)
+            self._cond.notify()
+        for listener in self.listeners:
+            listener(t, event, phase, value)
+
+    def close(self):
+        """未書き込みのイベントを書き出して fsync し、スレッドを止める"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join()
+
+    def segments(self, since=None) -> list:
+        """履歴ファイルのパスを古い順に返す。since (time.time() 値) 以前の月のファイルは含めない"""
+        first = time.strftime("%Y-%m", time.localtime(since)) if since is not None else ""
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(".lfh") and n[:7] >= first]
+        except OSError:
+            return []
+        return [os.path.join(self.directory, n) for n in sorted(names, key=self._segment_order)]
+
+    def read(self, since=None):
+        """(時刻, イベント名, フェーズ名, 値) を古い順に返すジェネレーター"""
+        events = {code: name for name, code in self.EVENTS.items()}
+        phases = {code: name for name, code in self.PHASES.items()}
+        for path in self.segments(since):
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError: continue
+            if not data.startswith(self.MAGIC): continue
+            # 書き込み途中で終わった末尾の不完全なレコードは無視する
+            end = len(data) - (len(data) - len(self.MAGIC)) % self.RECORD.size
+            for t, event, phase, value in self.RECORD.iter_unpack(data[len(self.MAGIC):end]):
+                if since is not None and t < since: continue
+                yield t, events.get(event), phases.get(phase), value
+
+    @staticmethod
+    def _segment_order(name):
+        # "2026-10.lfh", "2026-10.1.lfh", "2026-10.2.lfh" ... の順に並べる
+        parts = name[:-len(".lfh")].split(".")
+        return parts[0], int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+
+    def _open_segment(self, month):
+        """月が変わった・サイズ上限を超えた場合に書き込み先のファイルを切り替える"""
+        if self._file is not None and self._segment == month and self._file.tell() < self.max_bytes:
+            return self._file
+        # 同じ月の続きなら次の番号から、月が変わったら先頭から空きのあるファイルを探す
+        index = self._index + 1 if self._file is not None and self._segment == month else 0
+        self._close_file()
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            name = f"{month}.lfh" if index == 0 else f"{month}.{index}.lfh"
+            path = os.path.join(self.directory, name)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = 0
+            if size < self.max_bytes: break
+            index += 1
+        self._file = open(path, 'ab')
+        self._segment = month
+        self._index = index
+        if self._file.tell() == 0:
+            self._file.write(self.MAGIC)
+        return self._file
+
+    def _close_file(self):
+        if self._file is None: return
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        except OSError: pass
+        self._file = None
+
+    def _write(self, records):
+        try:
+            for record in records:
+                month = time.strftime("%Y-%m", time.localtime(self.RECORD.unpack(record)[0]))
+                self._open_segment(month).write(record)
+            self._file.flush()
+        except OSError: pass
+
+    def _run(self):
+        last_sync = time.monotonic()
+        dirty = False
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    # 未 fsync の書き込みがあれば、次の fsync 時刻までだけ待つ
+                    timeout = max(0.0, last_sync + self.fsync_interval - time.monotonic()) if dirty else None
+                    if dirty and timeout == 0.0: break
+                    self._cond.wait(timeout)
+                records, self._pending = self._pending, []
+                running = self._running
+            if records:
+                self._write(records)
+                dirty = True
+            if not running:
+                self._close_file()
+                return
+            if dirty and time.monotonic() - last_sync >= self.fsync_interval:
+                try:
+                    os.fsync(self._file.fileno())
+                except (OSError, AttributeError): pass
+                last_sync = time.monotonic()
+                dirty = False
+
+
+# =========================================
+# クラス定義: セッション統計
+# =========================================
+class SessionStats:
+    """
+    セッション履歴の集計。日ごとの集計値をイベントのたびに更新して保持するので、
+    今日・今週・今月の集計は履歴を読まずに数回の辞書参照で求まる。
+    任意期間の集計は履歴ファイルを mmap して固定長レコードを直接参照し、
+    NumPy があればベクトル演算、なければ struct で集計する。
+    """
+    VERSION = 1
+    SAVE_INTERVAL = 5.0
+    # 日ごとの集計値 [集中秒数, 完了した作業, 中断した作業, 作業中の一時停止] の添字
+    FOCUS, DONE, ABANDONED, PAUSES = range(4)
+    # SessionLog.RECORD と同じレイアウトの NumPy 構造化型
+    DTYPE = [("t", "<f8"), ("event", "u1"), ("phase", "u1"), ("pad", "V2"), ("value", "<f4")]
+
+    def __init__(self, history, path=STATS_FILE):
+        self.history = history
+        self.path = path
+        self.days = {}  # "YYYY-MM-DD" -> [focus_sec, done, abandoned, pauses]
+        self.until = 0.0  # 集計に反映済みの最後のイベント時刻
+        self.at_until = 0  # そのうち時刻が until と同じイベントの数（同時刻の記録を区別する）
+        self._lock = threading.Lock()
+        self._ready = False
+        self._backlog = []  # load() 完了前に届いたイベント
+        self._writer = CoalescingWriter(path, interval=self.SAVE_INTERVAL)
+        history.listeners.append(self.add)
+
+    def load(self):
+        """保存済みの集計を読み込み、その後に記録されたイベントだけを履歴から反映する"""
+        days, until, at_until = {}, 0.0, 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                days, until = data.get("days", {}), float(data.get("until", 0.0))
+                at_until = int(data.get("at_until", 1))
+        except (OSError, ValueError, AttributeError, TypeError): pass
+        # 集計の保存より後に書かれた分（通常は最新の月の末尾だけ）を読む
+        tail = list(self.history.read(since=until)) if until else list(self.history.read())
+        with self._lock:
+            self.days, self.until, self.at_until = days, until, at_until
+            applied = Counter()
+            for record in tail:
+                if record[0] < until: continue
+                if record[0] == until and at_until > 0:
+                    at_until -= 1  # 同時刻のイベントは反映済みの数だけ読み飛ばす
+                    continue
+                self._apply(*record)
+                applied[record] += 1
+            # load() 前に届いたイベントのうち、既に履歴ファイルに書かれて上で反映した分は除く
+            for record in map(self._as_stored, self._backlog):
+                if applied[record]:
+                    applied[record] -= 1
+                    continue
+                self._apply(*record)
+            self._backlog = []
+            self._ready = True
+        self._save()
+
+    def add(self, t, event, phase, value):
+        """SessionLog のリスナー。日ごとの集計値を更新するだけで、シリアライズはライタースレッドで行う"""
+        with self._lock:
+            if not self._ready:
+                self._backlog.append((t, event, phase, value))
+                return
+            self._apply(t, event, phase, value)
+        self._save()
+
+    def close(self):
+        self._writer.close()
+
+    @staticmethod
+    def _as_stored(record):
+        """履歴ファイルから読んだ場合と同じ値にする（値は float32 で保存される）"""
+        t, event, phase, value = record
+        return t, event, phase, struct.unpack("<f", struct.pack("<f", value))[0]
+
+    def _apply(self, t, event, phase, value):
+        if t == self.until:
+            self.at_until += 1
+        else:
+            self.until, self.at_until = t, 1
+        if phase != "WORK": return
+        day = self.days.setdefault(time.strftime("%Y-%m-%d", time.localtime(t)), [0.0, 0, 0, 0])
+        if event == "complete":
+            day[self.FOCUS] += value
+            day[self.DONE] += 1
+        elif event == "reset":
+            day[self.ABANDONED] += 1
+        elif event == "pause":
+            day[self.PAUSES] += 1
+
+    def _save(self):
+        self._writer.submit(self._serialize)
+
+    def _serialize(self) -> str:
+        """（ライタースレッド）ロック中はコピーだけ取り、JSON への変換はロックの外で行う"""
+        with self._lock:
+            days = {key: list(day) for key, day in self.days.items()}
+            until, at_until = self.until, self.at_until
+        return json.dumps({"version": self.VERSION, "until": until, "at_until": at_until, "days": days})
+
+    @staticmethod
+    def _period_days(period, now=None):
+        """"today" / "week" / "month" に含まれる日付（YYYY-MM-DD）の一覧"""
+        lt = time.localtime(now)
+        if period == "today":
+            offset = 0
+        elif period == "week":
+            offset = lt.tm_wday  # 月曜始まり
+        else:
+            offset = lt.tm_mday - 1
+        base = time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday, 12, 0, 0, 0, 0, -1))
+        return [time.strftime("%Y-%m-%d", time.localtime(base - 86400 * i)) for i in range(offset + 1)]
+
+    def summary(self, period, now=None) -> dict:
+        """今日・今週・今月の集計（日ごとの集計値を足し合わせるだけ）"""
+        totals = [0.0, 0, 0, 0]
+        with self._lock:
+            for key in self._period_days(period, now):
+                day = self.days.get(key)
+                if day:
+                    for i in range(4): totals[i] += day[i]
+        return self._summarize(totals)
+
+    def query(self, start, end) -> dict:
+        """start 以上 end 未満（time.time() 値）の任意期間を履歴ファイルから集計する"""
+        totals = [0.0, 0, 0, 0]
+        last_month = time.strftime("%Y-%m", time.localtime(end))
+        for path in self.history.segments(since=start):
+            if os.path.basename(path)[:7] > last_month: break
+            try:
+                with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    self._accumulate(mm, start, end, totals)
+            except (OSError, ValueError): pass  # 空ファイルは mmap できない
+        return self._summarize(totals)
+
+    def _accumulate(self, mm, start, end, totals):
+        header = len(SessionLog.MAGIC)
+        if mm[:header] != SessionLog.MAGIC: return
+        count = (len(mm) - header) // SessionLog.RECORD.size
+        work = SessionLog.PHASES["WORK"]
+        complete, reset, pause = (SessionLog.EVENTS[e] for e in ("complete", "reset", "pause"))
+        np = _import_numpy()
+        if np is not None:
+            records = np.frombuffer(mm, dtype=self.DTYPE, count=count, offset=header)
+            t, event = records["t"], records["event"]
+            work_mask = (records["phase"] == work) & (t >= start) & (t < end)
+            done = work_mask & (event == complete)
+            totals[self.FOCUS] += float(records["value"][done].sum())
+            totals[self.DONE] += int(np.count_nonzero(done))
+            totals[self.ABANDONED] += int(np.count_nonzero(work_mask & (event == reset)))
+            totals[self.PAUSES] += int(np.count_nonzero(work_mask & (event == pause)))
+            # mmap を閉じる前にバッファへの参照を手放す
+            del records, t, event, work_mask, done
+            return
+        with memoryview(mm) as view:
+            for t, event, phase, value in SessionLog.RECORD.iter_unpack(view[header:header + count * SessionLog.RECORD.size]):
+                if phase != work or t < start or t >= end: continue
+                if event == complete:
+                    totals[self.FOCUS] += value
+                    totals[self.DONE] += 1
+                elif event == reset:
+                    totals[self.ABANDONED] += 1
+                elif event == pause:
+                    totals[self.PAUSES] += 1
+
+    def _summarize(self, totals) -> dict:
+        sessions = totals[self.DONE] + totals[self.ABANDONED]
+        return {
+            "focus_min": totals[self.FOCUS] / 60,
+            "completed": totals[self.DONE],
+            "abandoned": totals[self.ABANDONED],
+            "completion_rate": totals[self.DONE] / sessions if sessions else None,
+            "pauses_per_session": totals[self.PAUSES] / sessions if sessions else None,
+        }
+
+
+# =========================================
+# クラス定義: 音源ライブラリ（マニフェスト）
+# =========================================
+class AssetLibrary:
+    """
+    音源フォルダの内容を、ファイル名・サイズ・更新時刻をキーにしたマニフェストで管理する。
+    前回から変化のないファイルは stat だけで済ませ、sound_names.json の再解析も行わない。
+    """
+    MANIFEST_VERSION = 1
+
+    def __init__(self, sound_dir=SOUND_DIR, names_file=SOUND_NAMES_FILE, manifest_file=ASSET_MANIFEST_FILE):
+        self.sound_dir = sound_dir
+        self.names_file = names_file
+        self.manifest_file = manifest_file
+        self.files = {}  # filename -> {"stat": [size, mtime_ns], "menu_key": str}
+        self._names_stat = None
+        self._dir_stat = None
+        self._manifest_loaded = False
+
+    @staticmethod
+    def _stat_key(path):
+        try:
+            st = os.stat(path)
+            return [st.st_size, st.st_mtime_ns]
+        except OSError:
+            return None
+
+    def _load_manifest(self):
+        self._manifest_loaded = True
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != self.MANIFEST_VERSION or data.get("lang") != CURRENT_LANG: return
+            self.files = data.get("files", {})
+            self._names_stat = data.get("names_stat")
+        except (OSError, ValueError, AttributeError): pass
+
+    def _save_manifest(self):
+        data = {
+            "version": self.MANIFEST_VERSION, "lang": CURRENT_LANG,
+            "names_stat": self._names_stat, "files": self.files,
+        }
+        try:
+            write_file_atomic(self.manifest_file, json.dumps(data, ensure_ascii=False))
+        except OSError: pass
+
+    def _read_name_map(self):
+        try:
+            with open(self.names_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    @staticmethod
+    def _menu_key(filename, name_map):
+        if filename in name_map:
+            entry = name_map[filename]
+            if isinstance(entry, dict):
+                return entry.get(CURRENT_LANG, entry.get("en", filename))
+            return str(entry)
+        return os.path.splitext(filename)[0]
+
+    def is_stale(self) -> bool:
+        """フォルダと sound_names.json の stat だけで追加・削除・名前変更の有無を調べる"""
+        return (self._stat_key(self.sound_dir) != self._dir_stat or
+                self._stat_key(self.names_file) != self._names_stat)
+
+    def scan(self) -> list:
+        """フォルダを走査してマニフェストを更新し、中身が変わった・消えたファイルのパスを返す"""
+        if not self._manifest_loaded: self._load_manifest()
+        self._dir_stat = self._stat_key(self.sound_dir)
+        names_stat = self._stat_key(self.names_file)
+        names_changed = names_stat != self._names_stat
+        name_map = None
+
+        files = {}
+        invalidated = []
+        try:
+            with os.scandir(self.sound_dir) as it:
+                for entry in it:
+                    if not entry.name.lower().endswith(SUPPORTED_EXTENSIONS) or not entry.is_file(): continue
+                    st = entry.stat()
+                    stat_key = [st.st_size, st.st_mtime_ns]
+                    prior = self.files.get(entry.name)
+                    unchanged = prior is not None and prior.get("stat") == stat_key
+                    if unchanged and not names_changed:
+                        files[entry.name] = prior
+                        continue
+                    if name_map is None: name_map = self._read_name_map()
+                    # 中身が同じなら、マニフェストに記録済みの付随情報は引き継ぐ
+                    record = dict(prior) if unchanged else {}
+                    record["stat"] = stat_key
+                    record["menu_key"] = self._menu_key(entry.name, name_map)
+                    files[entry.name] = record
+                    if prior is not None and not unchanged:
+                        invalidated.append(entry.path)
+        except OSError: pass
+
+        invalidated.extend(os.path.join(self.sound_dir, name) for name in self.files if name not in files)
+        if files != self.files or names_changed:
+            self.files = files
+            self._names_stat = names_stat
+            self._save_manifest()
+        return invalidated
+
+    def pending_work(self, target) -> list:
+        """(ファイル名, 変換が必要か, 測定が必要か) の一覧。target はミキサー形式の文字列"""
+        pending = []
+        for name, record in self.files.items():
+            transcode = name.lower().endswith(TRANSCODE_EXTENSIONS) and target not in record.get("pcm", {})
+            analyze = "loudness" not in record
+            if transcode or analyze:
+                pending.append((name, transcode, analyze))
+        return pending
+
+    def set_processed(self, filename, target, result):
+        """process_asset の結果を記録する。値が None の項目は「元のまま使う」「測定不能」を表す"""
+        record = self.files.get(filename)
+        if record is None: return
+        if "pcm" in result:
+            record["pcm"] = {target: result["pcm"]}
+        if "loudness" in result:
+            record["loudness"] = result["loudness"]
+        self._save_manifest()
+
+    def transcoded(self, target) -> dict:
+        """元ファイルのパス → 変換済みキャッシュのパスの辞書"""
+        return {os.path.join(self.sound_dir, name): record["pcm"][target]
+                for name, record in self.files.items() if record.get("pcm", {}).get(target)}
+
+    def loudness(self) -> dict:
+        """元ファイルのパス → 測定済みラウドネス (dBFS) の辞書"""
+        return {os.path.join(self.sound_dir, name): record["loudness"]
+                for name, record in self.files.items() if record.get("loudness") is not None}
+
+    def prune_transcodes(self, cache_dir=TRANSCODE_DIR):
+        """どの音源からも参照されなくなった変換済みキャッシュを削除する"""
+        referenced = {path for record in self.files.values() for path in record.get("pcm", {}).values() if path}
+        try:
+            with os.scandir(cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".wav") and os.path.join(cache_dir, entry.name) not in referenced:
+                        try: os.remove(entry.path)
+                        except OSError: pass
+        except OSError: pass
+
+    def noises(self) -> dict:
+        """メニュー名 → ファイルパスの辞書（先頭は「なし」）"""
+        noises = {"None": None}
+        for filename, record in self.files.items():
+            noises[record["menu_key"]] = os.path.join(self.sound_dir, filename)
+        return noises
+
+
+# =========================================
+# 音源の変換・ラウドネス測定（ワーカープロセス）
+# =========================================
+def _is_mixer_format(src, freq, size, channels) -> bool:
+    try:
+        with wave.open(src, 'rb') as w:
+            return (w.getframerate(), w.getsampwidth() * 8, w.getnchannels()) == (freq, abs(size), channels)
+    except (wave.Error, EOFError):
+        return False  # 浮動小数点 WAV など wave で読めない形式は pygame で変換する
+
+
+def _file_digest(path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _decode_to_mixer_format(src, freq, size, channels):
+    """pygame で音源をデコードし、ミキサー形式の生 PCM を返す（失敗時は None）"""
+    # 音声デバイスは開かず、pygame のデコーダーと変換処理だけを使う
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    _import_pygame()
+    if pygame.mixer.get_init() != (freq, size, channels):
+        pygame.mixer.quit()
+        pygame.mixer.init(freq, size, channels)
+        if pygame.mixer.get_init() != (freq, size, channels): return None
+    try:
+        return pygame.mixer.Sound(src).get_raw()
+    except pygame.error:
+        return None
+
+
+# pygame のサンプル形式 (size) -> (array / numpy の型コード, 無音の値)。size が負なら符号付き、正なら符号なし
+PCM_FORMATS = {-8: ('b', 0), 8: ('B', 0x80), -16: ('h', 0), 16: ('H', 0x8000)}
+
+
+def measure_loudness(raw, freq, size, channels):
+    """
+    生 PCM のラウドネス (dBFS) を求める。400ms ごとの平均二乗から、
+    BS.1770 と同じ絶対ゲート (-70dB) と相対ゲート (-10dB) で無音・小音量の区間を除いて平均する。
+    PCM_FORMATS に無い形式なら None。
+    """
+    if size not in PCM_FORMATS: return None
+    code, offset = PCM_FORMATS[size]
+    block = int(freq * 0.4) * channels
+    scale = float(1 << (abs(size) - 1))
+    np = _import_numpy()
+    if np is not None:
+        samples = np.frombuffer(raw, dtype=np.dtype(code), count=len(raw) // np.dtype(code).itemsize)
+        count = len(samples) // block
+        if count == 0: return None
+        x = samples[:count * block].astype(np.float32)
+        if offset: x -= float(offset)
+        x /= scale
+        powers = np.mean((x * x).reshape(count, block), axis=1).tolist()
+    else:
+        samples = array.array(code)
+        samples.frombytes(raw[:len(raw) - len(raw) % samples.itemsize])
+        if offset: samples = [v - offset for v in samples]  # 符号なし → 符号付き
+        norm = scale * scale * block
+        powers = [sum(map(operator.mul, chunk, chunk)) / norm
+                  for chunk in (samples[i:i + block] for i in range(0, len(samples) - block + 1, block))]
+
+    def mean_db(values):
+        return 10 * math.log10(sum(values) / len(values)) if values else None
+
+    gated = [p for p in powers if p > 1e-7]  # -70dB
+    level = mean_db(gated)
+    if level is None: return None
+    relative = 10 ** ((level - 10) / 10)
+    return mean_db([p for p in gated if p > relative])
+
+
+def process_asset(src, cache_dir, freq, size, channels, transcode=True, analyze=True) -> dict:
+    """
+    （ワーカープロセスで実行）音源を一度だけデコードして、次の処理を行う。
+    transcode: ミキサー形式の WAV に変換してキャッシュする（出力先は内容のハッシュで決まる）
+    analyze: ラウドネスを測定する
+    結果は {"pcm": 変換後のパスまたは None, "loudness": dBFS または None} の必要な項目だけを返す。
+    """
+    result = {}
+    raw = None
+    if transcode:
+        result["pcm"] = None
+        if not _is_mixer_format(src, freq, size, channels):
+            dst = os.path.join(cache_dir, f"{_file_digest(src)}_{freq}_{abs(size)}_{channels}.wav")
+            if not os.path.exists(dst):
+                raw = _decode_to_mixer_format(src, freq, size, channels)
+                if raw is not None:
+                    os.makedirs(cache_dir, exist_ok=True)
+                    tmp_path = f"{dst}.tmp"
+                    with wave.open(tmp_path, 'wb') as w:
+                        w.setnchannels(channels)
+                        w.setsampwidth(abs(size) // 8)
+                        w.setframerate(freq)
+                        w.writeframes(raw)
+                    os.replace(tmp_path, dst)
+            if os.path.exists(dst):
+                result["pcm"] = dst
+    if analyze:
+        if raw is None:
+            raw = _decode_to_mixer_format(src, freq, size, channels)
+        result["loudness"] = measure_loudness(raw, freq, size, channels) if raw is not None else None
+    return result
+
+
+# =========================================
+# クラス定義: 内蔵ノイズ（手続き的生成）
+# =========================================
+def _one_pole(np, x, a, state):
+    """
+    1次 IIR フィルター y[n] = a*y[n-1] + x[n] を列ごとにベクトル演算で計算する (0 < a < 1)。
+    区間内は累積和で、区間をまたぐ持ち越しは減衰が無視できるまでの等比級数で求める。
+    state は直前の出力（列ごと）。(出力, 新しい state) を返す。
+    """
+    n, ch = x.shape
+    # a^-chunk が大きくなりすぎない長さで区切る。累積和が連続したメモリを走るよう (列, 区間, 区間内) の順に並べる
+    chunk = max(1, min(1024, int(math.log(1e3) / -math.log(a))))
+    rows = -(-n // chunk)
+    blocks = np.zeros((ch, rows * chunk))
+    blocks[:, :n] = x.T
+    blocks = blocks.reshape(ch, rows, chunk)
+    powers = a ** np.arange(chunk)  # a^j
+    blocks /= powers
+    inner = np.cumsum(blocks, axis=2, out=blocks)
+    inner *= powers
+    # 区間 r の直前の出力 c_r = A^r * state + Σ_k A^(k-1) * e_(r-k)  (A = a^chunk, e = 区間内の最終値)
+    decay = a ** chunk
+    ends = inner[:, :, -1]
+    carries = (decay ** np.arange(rows))[None, :] * np.asarray(state)[:, None]
+    terms = min(rows, max(1, math.ceil(math.log(1e-12) / math.log(decay)))) if decay > 0 else 1
+    for k in range(1, terms):
+        carries[:, k:] += decay ** (k - 1) * ends[:, :rows - k]
+    inner += carries[:, :, None] * (powers * a)
+    y = inner.reshape(ch, -1)[:, :n].T
+    return y, y[-1].copy()
+
+
+class NoiseGenerator:
+    """
+    ホワイト/ピンク/ブラウンノイズを NumPy でブロックごとに合成し、
+    少数の Sound を使い回すリングバッファに書き込んでチャンネルのキューに流し続ける。
+    ディスクの読み込みもデコードもなく、メモリ使用量は RING_SIZE * BLOCK_SEC 分で一定。
+    """
+    COLORS = ("white", "pink", "brown")
+    BLOCK_SEC = 2.0
+    RING_SIZE = 3  # 再生中・キュー待ち・次に書き込む の3つ
+    # ピンクノイズ: Paul Kellet の近似（1次フィルター3段の和 + 直達成分）
+    PINK_POLES = ((0.99765, 0.0990460), (0.96300, 0.2965164), (0.57000, 1.0526913))
+    PINK_DIRECT = 0.1848
+    BROWN_POLE = 0.998
+
+    @staticmethod
+    def available() -> bool:
+        """NumPy が使えるか（読み込まずに確認する）"""
+        return importlib.util.find_spec("numpy") is not None
+
+    @classmethod
+    def builtin_noises(cls) -> dict:
+        """available_noises に加えるメニュー名 → 疑似パスの辞書"""
+        if not cls.available(): return {}
+        return {tr(f"noise_{color}"): BUILTIN_NOISE_PREFIX + color for color in cls.COLORS}
+
+    def __init__(self, color, channel, scheduler):
+        self.np = _import_numpy()
+        if self.np is None:
+            raise ImportError("numpy is required for built-in noises")
+        self.color = color
+        self.channel = channel
+        self.scheduler = scheduler
+        self.freq, size, self.channels = pygame.mixer.get_init()
+        if size != -16:
+            raise ValueError("unsupported mixer format")
+        self.frames = int(self.freq * self.BLOCK_SEC)
+        self.rng = self.np.random.default_rng()
+        self.ring = []
+        self._index = 0
+        self._states = {}
+        self._handle = None
+        self._running = False
+        self._lock = threading.Lock()  # stop() と _refill() のキュー操作を排他する
+        # 出力の RMS が基準ラウドネスになるように、入力（白色雑音）の標準偏差を決める
+        level = 10 ** (LOUDNESS_TARGET_DB / 20)
+        self._sigma = level / math.sqrt(self._output_variance())
+
+    def _output_variance(self) -> float:
+        """標準偏差1の白色雑音を入れたときの出力の分散"""
+        if self.color == "brown":
+            return 1 / (1 - self.BROWN_POLE ** 2)
+        if self.color == "pink":
+            poles, c = self.PINK_POLES, self.PINK_DIRECT
+            var = sum(gi * gj / (1 - ai * aj) for ai, gi in poles for aj, gj in poles)
+            return var + 2 * c * sum(g for _, g in poles) + c * c
+        return 1.0
+
+    def synthesize(self):
+        """次のブロック (frames x channels) を浮動小数点で合成する"""
+        np = self.np
+        white = self.rng.standard_normal((self.frames, self.channels)) * self._sigma
+        if self.color == "white":
+            return white
+        zero = np.zeros(self.channels)
+        if self.color == "brown":
+            out, self._states["brown"] = _one_pole(np, white, self.BROWN_POLE, self._states.get("brown", zero))
+            return out
+        out = white * self.PINK_DIRECT
+        for i, (a, g) in enumerate(self.PINK_POLES):
+            y, self._states[i] = _one_pole(np, white * g, a, self._states.get(i, zero))
+            out += y
+        return out
+
+    def _fill_next(self):
+        t0 = METRICS.start()
+        sound = self.ring[self._index]
+        self._index = (self._index + 1) % self.RING_SIZE
+        block = self.np.clip(self.synthesize() * 32767, -32768, 32767).astype(self.np.int16)
+        samples = pygame.sndarray.samples(sound)
+        samples[...] = block.reshape(samples.shape)
+        del samples
+        METRICS.stop("noise.synthesize", t0, color=self.color)
+        return sound
+
+    def start(self, volume, fade_ms=0):
+        shape = (self.frames, self.channels) if self.channels > 1 else (self.frames,)
+        self.ring = [pygame.sndarray.make_sound(self.np.zeros(shape, dtype=self.np.int16)) for _ in range(self.RING_SIZE)]
+        self._running = True
+        self.channel.set_volume(volume)
+        self.channel.play(self._fill_next(), fade_ms=fade_ms)
+        self.channel.queue(self._fill_next())
+        # キュー待ちのブロックが再生され始めた頃に次を書き込む
+        self._handle = self.scheduler.call_later(self.BLOCK_SEC + 0.1, self._refill)
+
+    def stop(self):
+        """
+        ブロックの補充をやめる。再生中のブロックは止めない（フェードアウトは呼び出し側に任せる）。
+        pygame はチャンネルが止まる・フェードアウトし終わるとキューの Sound を再生し始めるので、
+        キュー待ちのブロックは無音で上書きしておく。
+        """
+        with self._lock:
+            self._running = False
+            self.scheduler.cancel(self._handle)
+            self._handle = None
+            try:
+                queued = self.channel.get_queue()
+                if queued is not None:
+                    samples = pygame.sndarray.samples(queued)
+                    samples[...] = 0
+                    del samples
+            except pygame.error: pass
+
+    def _refill(self):
+        with self._lock:
+            if not self._running: return
+            try:
+                if self.channel.get_queue() is not None:
+                    # まだ前のブロックが再生中なので少し待つ
+                    self._handle = self.scheduler.call_later(0.1, self._refill)
+                    return
+                if not self.channel.get_busy():
+                    # 補充が間に合わず途切れた場合は再生し直す
+                    self.channel.play(self._fill_next())
+                self.channel.queue(self._fill_next())
+            except pygame.error:
+                self._running = False
+                return
+            self._handle = self.scheduler.call_later(self.BLOCK_SEC, self._refill)
+
+
+# =========================================
+# クラス定義: デコード済み音声キャッシュ
+# =========================================
+class AudioCache:
+    """
+    デコード済みの音声 (pygame.mixer.Sound) をメモリ上に保持するLRUキャッシュ。
+    デコードはワーカースレッドで先読みし、合計サイズが上限を超えたら古いものから破棄する。
+    """
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._sounds = OrderedDict()  # file_path -> (Sound, nbytes)
+        self._total_bytes = 0
+        self._loading = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="LeanFocusAudio")
+
+    def get(self, file_path):
+        """キャッシュ済みなら Sound を返す（未デコードなら None）"""
+        with self._lock:
+            entry = self._sounds.get(file_path)
+            if entry is None: return None
+            self._sounds.move_to_end(file_path)
+            return entry[0]
+
+    def prefetch(self, file_path):
+        """未キャッシュの音声をバックグラウンドでデコードする"""
+        if not file_path: return
+        with self._lock:
+            if file_path in self._sounds or file_path in self._loading: return
+            self._loading.add(file_path)
+        try:
+            self._executor.submit(self._load, file_path)
+        except RuntimeError:
+            with self._lock: self._loading.discard(file_path)
+
+    def discard(self, file_path):
+        """ファイルが変更・削除されたときにキャッシュから取り除く"""
+        with self._lock:
+            entry = self._sounds.pop(file_path, None)
+            if entry: self._total_bytes -= entry[1]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._sounds.clear()
+            self._total_bytes = 0
+
+    @staticmethod
+    def _sound_nbytes(sound):
+        freq, fmt, channels = pygame.mixer.get_init()
+        return int(sound.get_length() * freq) * channels * (abs(fmt) // 8)
+
+    def _load(self, file_path):
+        try:
+            if not os.path.exists(file_path): return
+            sound = pygame.mixer.Sound(file_path)
+            nbytes = self._sound_nbytes(sound)
+        except (pygame.error, TypeError):
+            # ミキサー未初期化・非対応形式の場合はストリーミング再生に任せる
+            return
+        finally:
+            with self._lock: self._loading.discard(file_path)
+
+        with self._lock:
+            if nbytes > self.budget_bytes or file_path in self._sounds: return
+            while self._sounds and self._total_bytes + nbytes > self.budget_bytes:
+                _, (_, old_nbytes) = self._sounds.popitem(last=False)
+                self._total_bytes -= old_nbytes
+            self._sounds[file_path] = (sound, nbytes)
+            self._total_bytes += nbytes
+
+
+# =========================================
+# クラス定義: タイマー状態のイベントバス
+# =========================================
+class TimerSnapshot(namedtuple("TimerSnapshot", "version state resume_state remaining deadline transition")):
+    """
+    タイマー状態の変更不可なスナップショット。
+    計測中は deadline（エンジンの時計でのフェーズ終了時刻）から残り時間を求めるので、
+    受け取った側は状態を読み直さずに毎秒の表示を更新できる。
+    transition はフェーズの期限による切り替え（クロスフェードの対象）かどうか。
+    """
+    __slots__ = ()
+
+    @property
+    def running(self) -> bool:
+        return self.deadline is not None
+
+    def remaining_at(self, now) -> int:
+        if self.deadline is None: return self.remaining
+        return max(0, math.ceil(self.deadline - now))
+
+    def next_tick_delay(self, now) -> float:
+        """remaining_at(now) の値が次に変わるまでの秒数"""
+        return (self.deadline - now) % 1.0
+
+
+class EventBus:
+    """
+    TimerEngine からのスナップショットを購読者に配る。
+    購読者ごとに dispatch(callback, snapshot) を指定でき、キューやスケジューラを渡せば
+    そのスレッドで受け取れる（省略時は発行したスレッドでそのまま呼ぶ）。
+    dispatch は発行中に呼ばれるので、他のスレッドの応答を待ってはいけない。
+    エンジンは発行を1つずつ行うので、どの購読者にも発行順に届く。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = ()  # 発行中に変更されても影響しないよう、登録のたびに作り直す
+        self.latest = None
+
+    def subscribe(self, callback, dispatch=None):
+        with self._lock:
+            self._subscribers += ((callback, dispatch),)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s[0] != callback)
+
+    def publish(self, snapshot: TimerSnapshot):
+        with self._lock:
+            self.latest = snapshot
+            for callback, dispatch in self._subscribers:
+                if dispatch is None: callback(snapshot)
+                else: dispatch(callback, snapshot)
+
+
+# =========================================
+# クラス定義: タイマーエンジン（ヘッドレス）
+# =========================================
+class NullSink:
+    """履歴の記録を捨てるシンク（ヘッドレス実行・シミュレーション用）"""
+    def log_event(self, event, phase, value=0.0): pass
+
+
+class VirtualClock:
+    """手動で進める仮想時計。TimerEngine の clock としてそのまま渡せる"""
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+class VirtualScheduler:
+    """
+    VirtualClock 上で動く DeadlineScheduler 互換のスケジューラ。
+    スレッドを持たず、advance() で時計を進めながら期限の来た予約を順に実行する。
+    """
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self._heap = []
+        self._cancelled = set()
+        self._seq = itertools.count(1)
+
+    def call_at(self, deadline, callback, *args) -> int:
+        handle = next(self._seq)
+        heapq.heappush(self._heap, (deadline, handle, callback, args))
+        return handle
+
+    def call_soon(self, callback, *args) -> int:
+        return self.call_at(self.clock.now, callback, *args)
+
+    def call_later(self, delay, callback, *args) -> int:
+        return self.call_at(self.clock.now + delay, callback, *args)
+
+    def cancel(self, handle):
+        if handle: self._cancelled.add(handle)
+
+    def shutdown(self):
+        self._heap.clear()
+        self._cancelled.clear()
+
+    def advance(self, seconds):
+        """時計を seconds 秒進め、その間に期限を迎えた予約をすべて実行する"""
+        until = self.clock.now + seconds
+        while self._heap and self._heap[0][0] <= until:
+            deadline, handle, callback, args = heapq.heappop(self._heap)
+            if handle in self._cancelled:
+                self._cancelled.discard(handle)
+                continue
+            self.clock.now = max(self.clock.now, deadline)
+            callback(*args)
+        self.clock.now = until
+
+
+class TimerEngine:
+    """
+    ポモドーロの状態遷移だけを持つヘッドレスなエンジン。状態が変わるたびに EventBus へ
+    スナップショットを発行し、音声・UI はそれを購読して反応する。
+    時計・スケジューラ・イベントバスを差し替えられるため、
+    VirtualClock と VirtualScheduler を渡せば実時間を待たずに何千サイクルでも回せる。
+    """
     STATE_STOPPED = "STOP"
     STATE_WORK = "WORK"
     STATE_BREAK = "BREAK"
     STATE_PAUSED = "PAUSE"
 
-    def __init__(self):
+    def __init__(self, clock=monotonic_clock, scheduler=None, events=None, history=None,
+                 work_duration=None, break_duration=None, suspend_policy="catch_up"):
+        self.clock = clock
+        self.scheduler = scheduler if scheduler is not None else DeadlineScheduler(clock)
+        self.events = events if events is not None else EventBus()
+        self.history = history or NullSink()
+        self.work_duration = WORK_DURATION if work_duration is None else work_duration
+        self.break_duration = BREAK_DURATION if break_duration is None else break_duration
+        self.suspend_policy = suspend_policy
+
         self.state = self.STATE_STOPPED
         self.resume_state = self.STATE_WORK
-        self.remaining_time = WORK_DURATION
-        
-        self.stop_event = threading.Event()
-        self.timer_thread = None
-        self.end_time = 0 
+        self.remaining_time = self.work_duration
+
+        self._lock = threading.RLock()
+        self._depth = 0  # _transaction() の入れ子の深さ
+        self._outbox = []  # 発行待ちのスナップショット
+        self._deliver_lock = threading.Lock()  # 発行するスレッドを1つに絞り、発行順を保つ
+        self._phase_handle = None
+        self._phase_token = 0
+        self._version = 0
+        self.end_time = 0
+        self._publish()
+        self._deliver()
+
+    @property
+    def remaining_time(self) -> int:
+        """残り秒数。計測中は end_time から都度計算する"""
+        if self.state == self.STATE_WORK or self.state == self.STATE_BREAK:
+            return max(0, math.ceil(self.end_time - self.clock()))
+        return self._remaining_time
+
+    @remaining_time.setter
+    def remaining_time(self, seconds):
+        self._remaining_time = seconds
+
+    def next_tick_delay(self) -> float:
+        """remaining_time の表示値が次に変わるまでの秒数"""
+        return (self.end_time - self.clock()) % 1.0
+
+    def _publish(self, transition=False):
+        """現在の状態をスナップショットにして発行待ちに積む。発行は _transaction() を抜けてから行う"""
+        with self._lock:
+            self._version += 1
+            running = self.state == self.STATE_WORK or self.state == self.STATE_BREAK
+            self._outbox.append(TimerSnapshot(self._version, self.state, self.resume_state, self.remaining_time,
+                                              self.end_time if running else None, transition))
+
+    @contextmanager
+    def _transaction(self):
+        """
+        ロックを持って状態を変え、ロックを放してからスナップショットを発行する。
+        購読者の dispatch が他のスレッドを待っても、そのスレッドがエンジンを操作できるようにするため。
+        """
+        with self._lock:
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+            outermost = self._depth == 0
+        if outermost: self._deliver()
+
+    def _deliver(self):
+        """
+        発行待ちを順に発行する。他のスレッドが発行中なら待たずに戻り、そのスレッドに続きを任せる
+        （発行中の購読者がこのスレッドを待っていても止まらないようにする）。
+        """
+        while self._deliver_lock.acquire(blocking=False):
+            try:
+                with self._lock:
+                    pending, self._outbox = self._outbox, []
+                for snapshot in pending:
+                    self.events.publish(snapshot)
+            finally:
+                self._deliver_lock.release()
+            with self._lock:
+                if not self._outbox: return
+
+    def start_pomodoro(self):
+        with self._transaction():
+            if self.state == self.STATE_WORK or self.state == self.STATE_BREAK: return
+            if self.state == self.STATE_STOPPED:
+                self.remaining_time = self.work_duration
+            # 状態を切り替える前に end_time を確定させ、他スレッドから 0 秒が見えないようにする
+            self.end_time = self.clock() + self._remaining_time
+            event = "start" if self.state == self.STATE_STOPPED else "resume"
+            if self.state == self.STATE_STOPPED:
+                self.state = self.STATE_WORK
+            elif self.state == self.STATE_PAUSED:
+                self.state = self.resume_state
+            self.history.log_event(event, self.state, self._remaining_time)
+            
+            self._arm_phase_deadline(self.end_time)
+            self._publish()
+
+    def stop_pomodoro(self):
+        with self._transaction():
+            if self.state == self.STATE_STOPPED or self.state == self.STATE_PAUSED: return
+            # 計測中の残り時間を固定してから一時停止する
+            self.remaining_time = self.remaining_time
+            self.resume_state = self.state
+            self.state = self.STATE_PAUSED
+            self._cancel_phase_deadline()
+            self.history.log_event("pause", self.resume_state, self._remaining_time)
+            self._publish()
+
+    def reset_timer(self):
+        with self._transaction():
+            if self.state != self.STATE_STOPPED:
+                phase = self.resume_state if self.state == self.STATE_PAUSED else self.state
+                self.history.log_event("reset", phase, self.remaining_time)
+            self._cancel_phase_deadline()
+            self.state = self.STATE_STOPPED
+            self.remaining_time = self.work_duration
+            self._publish()
+
+    # --- リスタート機能 ---
+    def restart_and_pause(self):
+        """現在のセッションを初期化し、一時停止状態で待機する"""
+        with self._transaction():
+            if self.state == self.STATE_STOPPED: return
+
+            if self.state in [self.STATE_WORK, self.STATE_BREAK]:
+                self.resume_state = self.state
+            
+            if self.resume_state == self.STATE_WORK:
+                self.remaining_time = self.work_duration
+            else:
+                self.remaining_time = self.break_duration
+            
+            self.state = self.STATE_PAUSED
+            self._cancel_phase_deadline()
+            self.history.log_event("reset", self.resume_state, self._remaining_time)
+            self._publish()
+
+    def restore(self, state, resume_state, remaining, until_deadline=None):
+        """
+        チェックポイントから状態を戻す（停止中のみ）。計測中だった場合は until_deadline
+        （保存されたフェーズ終了時刻までの秒数。過ぎていれば負）から今のフェーズと残り時間を計算する。
+        期限を1サイクル（作業 + 休憩）以上過ぎていれば古い記録として破棄し、停止のままにする。
+        実際には計測していないので、履歴にはイベントを記録しない。
+        """
+        durations = {self.STATE_WORK: self.work_duration, self.STATE_BREAK: self.break_duration}
+        with self._transaction():
+            if self.state != self.STATE_STOPPED: return
+            if state in durations and until_deadline is not None:
+                if -until_deadline > self.work_duration + self.break_duration: return
+                self.state = self.resume_state = state
+                self.remaining_time = durations[state]
+                self.end_time = self.clock() + until_deadline
+                if until_deadline < 0:
+                    # 落ちている間に期限を過ぎていれば、スリープ復帰と同じく経過時間から1回で求める
+                    self._resume_after_gap(-until_deadline, log=False)
+                    return
+                self._arm_phase_deadline(self.end_time)
+                self._publish()
+            elif state == self.STATE_PAUSED and resume_state in durations:
+                self.state = self.STATE_PAUSED
+                self.resume_state = resume_state
+                self.remaining_time = max(0, min(remaining, durations[resume_state]))
+                self._publish()
+
+    def _arm_phase_deadline(self, end_time):
+        """フェーズ終了時刻をスケジューラに登録する（既存の予約は取り消す）"""
+        self._cancel_phase_deadline()
+        self.end_time = end_time
+        self._phase_handle = self.scheduler.call_at(end_time, self._on_phase_deadline, self._phase_token)
+
+    def _cancel_phase_deadline(self):
+        # トークンを進めておけば、取り消しと入れ違いで実行された古い予約も無視できる
+        self._phase_token += 1
+        if self._phase_handle:
+            self.scheduler.cancel(self._phase_handle)
+            self._phase_handle = None
+
+    def _on_phase_deadline(self, token):
+        """スケジューラスレッド上でフェーズ終了時に呼ばれる"""
+        with self._transaction():
+            if token != self._phase_token: return
+            if self.state != self.STATE_WORK and self.state != self.STATE_BREAK: return
+            overdue = self.clock() - self.end_time
+            if METRICS.enabled:
+                METRICS.record("timer.drift", overdue, state=self.state)
+            self._phase_handle = None
+            if overdue > SUSPEND_GAP_THRESHOLD:
+                self._resume_after_gap(overdue)
+                return
+            self._transition_state()
+            if self.state in [self.STATE_WORK, self.STATE_BREAK]:
+                self._arm_phase_deadline(self.end_time)
+
+    def _resume_after_gap(self, overdue, log=True):
+        """
+        スリープ復帰などで期限を大きく過ぎていた場合に、経過時間を1回でまとめて処理する。
+        log=False（チェックポイントからの復元）では履歴に完了・一時停止を記録しない。
+        """
+        if METRICS.enabled:
+            METRICS.record("timer.suspend_gap", overdue, policy=self.suspend_policy)
+        durations = {self.STATE_WORK: self.work_duration, self.STATE_BREAK: self.break_duration}
+        other = {self.STATE_WORK: self.STATE_BREAK, self.STATE_BREAK: self.STATE_WORK}
+        next_state = other[self.state]
+        if log: self.history.log_event("complete", self.state, durations[self.state])
+
+        if self.suspend_policy == "pause":
+            # 終わったフェーズは完了扱いにして、次のフェーズの頭で一時停止する
+            self.remaining_time = durations[next_state]
+            self.resume_state = next_state
+            self.state = self.STATE_PAUSED
+            if log: self.history.log_event("pause", next_state, durations[next_state])
+            self._publish()
+            return
+
+        # 周期で割った余りから、今どのフェーズの何秒目にいるかを求める（最大2ステップ）
+        cycle = self.work_duration + self.break_duration
+        elapsed = overdue % cycle if cycle > 0 else 0
+        state = next_state
+        while elapsed >= durations[state]:
+            if log: self.history.log_event("complete", state, durations[state])
+            elapsed -= durations[state]
+            state = other[state]
+        self.remaining_time = durations[state]
+        self.end_time = self.clock() + durations[state] - elapsed
+        self.state = state
+        self._arm_phase_deadline(self.end_time)
+        self._publish(transition=True)
+
+    def _transition_state(self):
+        if self.state == self.STATE_WORK or self.state == self.STATE_BREAK:
+            self.history.log_event("complete", self.state,
+                                   self.work_duration if self.state == self.STATE_WORK else self.break_duration)
+        if self.state == self.STATE_WORK:
+            self.remaining_time = self.break_duration
+            # 前の期限を起点にして、遅れが次のフェーズに積み重ならないようにする
+            self.end_time += self.break_duration
+            self.state = self.STATE_BREAK
+        elif self.state == self.STATE_BREAK:
+            self.remaining_time = self.work_duration
+            self.end_time += self.work_duration
+            self.state = self.STATE_WORK
+        self._publish(transition=True)
+
+
+# =========================================
+# クラス定義: ローカル制御ソケット
+# =========================================
+class ControlServer:
+    """
+    外部のステータスバーやスクリプト向けの制御ソケット。1行1コマンドを受け取り、1行1JSONで応答する。
+    最初の行は "auth <トークン>" でなければならない。トークンは起動ごとに作り、本人だけが読める
+    ファイル (control_token_path) に書く。Windows の TCP ポートにはブラウザの fetch() なども届くので、
+    トークンを知らない接続（HTTP リクエストなど）は最初の行で切る。
+      start / stop / reset / restart : タイマーを操作する
+      status                         : 現在の状態を返す
+      subscribe                      : 以後、状態が変わるたびに状態を送る（EventBus の購読者として動く）
+    状態には次のフェーズ切り替え時刻（deadline, UNIX 時刻）が入るので、クライアントは
+    ポーリングせずに自分で残り時間を数えられる。asyncio で動かすため、購読者が多くても待機中は
+    スレッド1つが眠っているだけになる。
+    """
+    COMMANDS = leanfocus_control.COMMANDS
+    MAX_PENDING_BYTES = 64 * 1024  # 読まずに溜め込む購読者はこれを超えたら切断する
+
+    def __init__(self, app, address=None, token_path=None):
+        self.app = app
+        self.address = address or control_address()
+        self.token_path = token_path or leanfocus_control.control_token_path()
+        self.token = None
+        self.loop = None
+        self.subscribers = set()
+        self._clients = set()
+        self.ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="LeanFocusControl", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        if self.loop is None: return
+        try: self.loop.call_soon_threadsafe(self.loop.stop)
+        except RuntimeError: pass
+        for path in (self.address, self.token_path):
+            if not isinstance(path, str): continue
+            try: os.unlink(path)
+            except OSError: pass
+
+    def _dispatch(self, callback, snapshot):
+        """イベントバスの通知をイベントループのスレッドに渡す"""
+        try: self.loop.call_soon_threadsafe(callback, snapshot)
+        except RuntimeError: pass
+
+    def on_timer_event(self, snapshot):
+        if self.subscribers:
+            self._broadcast(self._encode(self.message(snapshot)))
+
+    def message(self, snapshot=None) -> dict:
+        snapshot = snapshot or self.app.events.latest
+        now = self.app.engine.clock()
+        # 単調時計はプロセスをまたいで比べられないので、期限は UNIX 時刻に直して渡す
+        deadline = round(time.time() + snapshot.deadline - now, 3) if snapshot.running else None
+        return {"event": "state", "state": snapshot.state, "resume_state": snapshot.resume_state,
+                "remaining": snapshot.remaining_at(now), "deadline": deadline}
+
+    @staticmethod
+    def _encode(message) -> bytes:
+        return (json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8")
+
+    @staticmethod
+    def _write_token(path) -> str:
+        """新しいトークンを作り、本人だけが読めるファイルに書く（既存のファイルやリンクは使い回さない）"""
+        token = secrets.token_hex(16)
+        try: os.unlink(path)
+        except FileNotFoundError: pass
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0), 0o600)
+        with os.fdopen(fd, "w", encoding="ascii") as f:
+            f.write(token)
+        return token
+
+    def _authorized(self, line) -> bool:
+        command, _, token = line.strip().partition(b" ")
+        return command.lower() == leanfocus_control.AUTH_COMMAND.encode() and hmac.compare_digest(token, self.token.encode())
+
+    @staticmethod
+    def _claim_unix_path(path) -> bool:
+        """前回のソケットファイルが残っていれば消す。別のインスタンスが使用中なら False"""
+        if not os.path.exists(path): return True
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            return False
+        except OSError:
+            try: os.unlink(path)
+            except OSError: pass
+            return True
+        finally:
+            probe.close()
+
+    def _run(self):
+        import asyncio
+        loop = asyncio.new_event_loop()
+        try:
+            if isinstance(self.address, str):
+                if not self._claim_unix_path(self.address):
+                    loop.close()
+                    return
+                server = loop.run_until_complete(asyncio.start_unix_server(self._handle, path=self.address))
+                os.chmod(self.address, 0o600)
+            else:
+                host, port = self.address
+                server = loop.run_until_complete(asyncio.start_server(self._handle, host, port))
+            # 待ち受けられた（他のインスタンスがいない）ときだけトークンを書き換える
+            try:
+                self.token = self._write_token(self.token_path)
+            except OSError:
+                server.close()
+                raise
+            self.loop = loop
+            self.app.events.subscribe(self.on_timer_event, dispatch=self._dispatch)
+        except OSError:
+            loop.close()
+            return
+        finally:
+            self.ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            # 接続を閉じれば各接続の処理は EOF を受けて終わるので、それを待ってからループを閉じる
+            self.app.events.unsubscribe(self.on_timer_event)
+            server.close()
+            for writer in self._clients: writer.close()
+            tasks = asyncio.all_tasks(loop)
+            if tasks:
+                loop.run_until_complete(asyncio.wait(tasks, timeout=1.0))
+            loop.close()
+
+    async def _handle(self, reader, writer):
+        self._clients.add(writer)
+        try:
+            if not self._authorized(await reader.readline()):
+                writer.write(self._encode({"event": "error", "error": "unauthorized"}))
+                await writer.drain()
+                return
+            while True:
+                line = await reader.readline()
+                if not line: break
+                command = line.decode("utf-8", "replace").strip().lower()
+                if not command: continue
+                if command == "subscribe":
+                    self.subscribers.add(writer)
+                    writer.write(self._encode(self.message()))
+                elif command == "status":
+                    writer.write(self._encode(self.message()))
+                elif command in self.COMMANDS:
+                    # 音声の切り替えなどで待たされても他の接続が止まらないよう、別スレッドで実行する
+                    await self.loop.run_in_executor(None, getattr(self.app, self.COMMANDS[command]))
+                    writer.write(self._encode({"event": "ok", "command": command}))
+                else:
+                    writer.write(self._encode({"event": "error", "command": command, "error": "unknown command"}))
+                await writer.drain()
+        except (ConnectionError, ValueError, OSError): pass
+        finally:
+            self._clients.discard(writer)
+            self.subscribers.discard(writer)
+            writer.close()
+
+    def _broadcast(self, line):
+        for writer in list(self.subscribers):
+            if writer.transport.get_write_buffer_size() > self.MAX_PENDING_BYTES:
+                self.subscribers.discard(writer)
+                writer.close()
+                continue
+            writer.write(line)
+
+
+# =========================================
+# クラス定義: ポモドーロタイマー本体（ロジック）
+# =========================================
+class PomodoroTimer:
+    STATE_STOPPED = TimerEngine.STATE_STOPPED
+    STATE_WORK = TimerEngine.STATE_WORK
+    STATE_BREAK = TimerEngine.STATE_BREAK
+    STATE_PAUSED = TimerEngine.STATE_PAUSED
+
+    def __init__(self):
+        # 状態遷移は TimerEngine が持ち、フェーズ切り替えは常駐スケジューラが期限まで眠って実行する
+        self.scheduler = DeadlineScheduler(clock=monotonic_clock)
+        self.history = SessionLog()
+        self.stats = SessionStats(self.history)
+        self.events = EventBus()
+        self.engine = TimerEngine(clock=monotonic_clock, scheduler=self.scheduler, events=self.events,
+                                  history=self.history)
+        # 音の切り替えは専用スレッドで1つずつ行う。音源スキャンやストリーミングの読み込みを待っても、
+        # フェーズの期限や内蔵ノイズの補充を受け持つスケジューラスレッドは止めない
+        self._sound_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="LeanFocusSound")
+        self.events.subscribe(self.on_timer_event, dispatch=self._submit_sound)
+        # トレイメニューの更新は要求をまとめるだけなので、発行したスレッドでそのまま受け取る
+        self.events.subscribe(lambda snapshot: self._update_menu())
         
-        self.available_noises = self._scan_assets()
+        # 音源の一覧はバックグラウンドでスキャンする (scan_assets_async)
+        self.assets = AssetLibrary()
+        self.available_noises = {"None": None}
+        self._assets_ready = threading.Event()
         self.config = self.load_config() 
+        self.engine.suspend_policy = self.config.get("suspend_policy", "catch_up")
+        self.config_writer = CoalescingWriter(CONFIG_FILE, self.config.get("config_save_interval", CONFIG_SAVE_INTERVAL))
+        # 状態が変わるたびにチェックポイントを書き込み待ちにする。計測中は期限が変わらないので書き込みは起きない
+        self.checkpoint_writer = CoalescingWriter(CHECKPOINT_FILE, CHECKPOINT_SAVE_INTERVAL)
+        self.events.subscribe(self._save_checkpoint)
         
         self.icon = None 
         self.floating_window: FloatingTimer = None
+        self.control: ControlServer = None
+        self.tray_progress: TrayProgressIcon = None
+        self._menu_lock = threading.Lock()
+        self._menu_update_pending = False
         
-        self._init_pygame()
-
-    def _init_pygame(self):
+        self.audio_cache = AudioCache(int(self.config.get("audio_cache_mb", AUDIO_CACHE_BUDGET_MB) * 1024 * 1024))
+        self._noise_channels = []
+        self._noise_channel = None
+        self._transcoded = {}  # 元ファイルのパス -> ミキサー形式に変換済みのパス
+        self._gains = {}  # 元ファイルのパス -> 音量をそろえるための倍率
+        self._current_source = None  # 再生中の音源（元ファイルのパス）
+        self._generator = None  # 再生中の内蔵ノイズ
+        # レイヤー用チャンネルは MAX_LAYERS 個ずつの2組を持ち、クロスフェード時は組ごと交互に使う
+        self._layer_banks = [[], []]
+        # レイヤーの状態はトレイ・Tk・スケジューラの各スレッドから触るので、このロックで守る
+        self._layer_lock = threading.RLock()
+        self._layer_bank = 0
+        self._active_layers = {}  # レイヤー番号 -> (チャンネル, 元ファイルのパス)
+        self._layer_generators = []
+        self._layer_token = 0
+        self._layer_phase = "work"
+        self._current_gain = 1.0  # 再生中の音源の倍率
+        self._processing = set()  # 変換・測定中のファイル名
+        self._asset_pool = None
+        # pygame は初めて音を鳴らすときに読み込む
+        self._mixer_lock = threading.Lock()
+        self._mixer_tried = False
+        self._mixer_ready = False
+
+    def _init_pygame(self) -> bool:
+        """pygame を読み込んでミキサーを初期化する（初回のみ）。使用可能なら True"""
+        with self._mixer_lock:
+            if self._mixer_tried: return self._mixer_ready
+            self._mixer_tried = True
+            try:
+                _import_pygame()
+            except ImportError:
+                return False
+            try:
+                with PROFILER.phase("init:mixer"):
+                    pygame.mixer.init()
+                # ノイズ再生用に2チャンネルを予約し、クロスフェード時は交互に使う。
+                # その後ろにレイヤー用のチャンネルを2組予約する
+                reserved = 2 + 2 * MAX_LAYERS
+                if pygame.mixer.get_num_channels() < reserved:
+                    pygame.mixer.set_num_channels(reserved)
+                pygame.mixer.set_reserved(reserved)
+                self._noise_channels = [pygame.mixer.Channel(0), pygame.mixer.Channel(1)]
+                self._noise_channel = self._noise_channels[0]
+                self._layer_banks = [[pygame.mixer.Channel(2 + bank * MAX_LAYERS + i) for i in range(MAX_LAYERS)]
+                                     for bank in (0, 1)]
+                self._mixer_ready = True
+            except pygame.error: pass
+        if self._mixer_ready:
+            self._prefetch_noises()
+            self.scheduler.call_soon(self._process_assets)
+        return self._mixer_ready
+
+    def scan_assets_async(self):
+        """音源フォルダのスキャンをバックグラウンドで開始する"""
+        threading.Thread(target=self._load_assets, name="LeanFocusAssets", daemon=True).start()
+
+    def load_stats_async(self):
+        """統計の集計値の読み込みをバックグラウンドで開始する"""
+        threading.Thread(target=self.stats.load, name="LeanFocusStats", daemon=True).start()
+
+    def _load_assets(self):
+        with PROFILER.phase("scan:assets"):
+            self.available_noises = self._scan_assets()
+        self._validate_noise_config()
+        self._assets_ready.set()
+        PROFILER.mark("assets_ready")
+        if self._mixer_ready:
+            self._prefetch_noises()
+            self.scheduler.call_soon(self._process_assets)
+        self._update_menu()
+        self.scheduler.call_later(ASSET_WATCH_INTERVAL, self._watch_assets)
+
+    def _prefetch_noises(self, *noise_keys):
+        """指定した（省略時は設定済みの作業・休憩用）ノイズを先読みする"""
+        if not self._mixer_ready: return
+        if not noise_keys:
+            noise_keys = self._phase_noise_keys("work") + self._phase_noise_keys("break")
+        for key in noise_keys:
+            file_path = self.available_noises.get(key)
+            if file_path and not file_path.startswith(BUILTIN_NOISE_PREFIX):
+                self.audio_cache.prefetch(self._playable_path(file_path))
+
+    def _phase_noise_keys(self, noise_type) -> list:
+        """フェーズで鳴らす音源のメニュー名（主音源 + レイヤー）"""
+        return [self.config.get(f"{noise_type}_noise")] + [layer["noise"] for layer in self.config.get(f"{noise_type}_layers", [])]
+
+    def _playable_path(self, file_path):
+        """変換済みキャッシュがあればそのパスを、なければ元のパスを返す"""
+        cached = self._transcoded.get(file_path)
+        if cached and os.path.exists(cached): return cached
+        return file_path
+
+    @staticmethod
+    def _mixer_target():
+        """変換先のミキサー形式 (freq, size, channels)。WAV に書けない形式なら None"""
+        freq, size, channels = pygame.mixer.get_init()
+        if size not in (-16, 8): return None
+        return freq, size, channels
+
+    def _process_assets(self):
+        """（スケジューラスレッド）未処理の音源の変換・ラウドネス測定をワーカープロセスで行う"""
+        if not self._mixer_ready or not self._assets_ready.is_set(): return
+        target = self._mixer_target()
+        if target is None: return
+        key = "/".join(map(str, target))
+        self._refresh_processed(key)
+        pending = [job for job in self.assets.pending_work(key) if job[0] not in self._processing]
+        if not pending: return
+        if self._asset_pool is None:
+            # fork するとミキサーやスレッドの状態まで引き継ぐので、どの OS でも spawn で起動する
+            self._asset_pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        for name, transcode, analyze in pending:
+            src = os.path.join(self.assets.sound_dir, name)
+            try:
+                future = self._asset_pool.submit(process_asset, src, TRANSCODE_DIR, *target,
+                                                 transcode=transcode, analyze=analyze)
+            except RuntimeError: return
+            self._processing.add(name)
+            future.add_done_callback(
+                lambda f, name=name: self.scheduler.call_soon(self._on_asset_processed, name, key, f))
+
+    def _on_asset_processed(self, name, key, future):
+        self._processing.discard(name)
         try:
-            pygame.mixer.init()
-        except pygame.error: pass
+            result = future.result()
+        except Exception:
+            # 処理できないファイルは元のまま・補正なしで再生する
+            result = {"pcm": None, "loudness": None}
+        self.assets.set_processed(name, key, result)
+        self._refresh_processed(key)
+        if not self._processing:
+            self.assets.prune_transcodes()
+
+    def _refresh_processed(self, key):
+        """マニフェストの記録から変換済みパスと音量補正の倍率を引き直す"""
+        self._transcoded = self.assets.transcoded(key)
+        self._gains = {
+            path: min(1.0, 10 ** ((LOUDNESS_TARGET_DB - loudness) / 20))
+            for path, loudness in self.assets.loudness().items()
+        }
 
     def _scan_assets(self) -> dict:
-        noises = {"None": None}
-        if not os.path.isdir(SOUND_DIR): return noises
-        
-        name_map = {}
-        if os.path.exists(SOUND_NAMES_FILE):
-            try:
-                with open(SOUND_NAMES_FILE, 'r', encoding='utf-8') as f:
-                    name_map = json.load(f)
-            except Exception: pass
-
-        try:
-            for filename in os.listdir(SOUND_DIR):
-                file_path = os.path.join(SOUND_DIR, filename)
-                if os.path.isfile(file_path) and filename.lower().endswith(SUPPORTED_EXTENSIONS):
-                    if filename in name_map:
-                        entry = name_map[filename]
-                        if isinstance(entry, dict):
-                            menu_key = entry.get(CURRENT_LANG, entry.get("en", filename))
-                        else:
-                            menu_key = str(entry)
-                    else:
-                        menu_key = os.path.splitext(filename)[0]
-                    noises[menu_key] = file_path
-        except OSError: pass
+        """音源フォルダを（マニフェストを使って差分だけ）走査し、メニュー名→パスの辞書を返す"""
+        for file_path in self.assets.scan():
+            # 中身が変わった・削除されたファイルのデコード済みデータは捨てる
+            self.audio_cache.discard(file_path)
+        noises = self.assets.noises()
+        noises.update(NoiseGenerator.builtin_noises())
         return noises
 
+    def _validate_noise_config(self):
+        # 設定済みの音源が見つからない場合は「なし」に戻す
+        for noise_type in ("work", "break"):
+            if self.config.get(f"{noise_type}_noise") not in self.available_noises:
+                self.config[f"{noise_type}_noise"] = "None"
+            for layer in self.config.get(f"{noise_type}_layers", []):
+                if layer["noise"] not in self.available_noises:
+                    layer["noise"] = "None"
+
+    def _watch_assets(self):
+        """音源フォルダを低頻度で stat し、変化があれば再スキャンしてメニューに反映する"""
+        if self.assets.is_stale():
+            noises = self._scan_assets()
+            if noises != self.available_noises:
+                self.available_noises = noises
+                self._validate_noise_config()
+                self._update_menu()
+            self._process_assets()
+        self.scheduler.call_later(ASSET_WATCH_INTERVAL, self._watch_assets)
+
     def load_config(self):
         default = {
             "work_noise": "None", "break_noise": "None", "volume": 1.0,
             "show_timer": False, 
-            "font_size": 24, "opacity": 0.7, "window_x": None, "window_y": None
+            "font_size": 24, "opacity": 0.7, "window_x": None, "window_y": None,
+            "config_save_interval": CONFIG_SAVE_INTERVAL,
+            "audio_cache_mb": AUDIO_CACHE_BUDGET_MB,
+            "crossfade_sec": 0,
+            "normalize_loudness": True,
+            "work_layers": [], "break_layers": [],
+            "suspend_policy": "catch_up",
+            "control_server": True,
+            "overlay_renderer": "label",
+            "tray_progress": False,
+            "slider_preview_fps": SLIDER_PREVIEW_FPS,
+            "instrumentation": False
         }
         if not os.path.exists(CONFIG_FILE): return default
         try:
             with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
                 d = json.load(f)
             
+            # 存在しない音源の検証はスキャン完了後に _load_assets で行う
             work = d.get("work_noise", "None")
             if work == "なし": work = "None"
             break_ = d.get("break_noise", "None")
             if break_ == "なし": break_ = "None"
-
-            if work not in self.available_noises: work = "None"
-            if break_ not in self.available_noises: break_ = "None"
             
             return {
                 "work_noise": work, 
@@ -729,47 +3254,239 @@ class PomodoroTimer:
                 "font_size": d.get("font_size", 24),
                 "opacity": d.get("opacity", 0.7),
                 "window_x": d.get("window_x"),
-                "window_y": d.get("window_y")
+                "window_y": d.get("window_y"),
+                "config_save_interval": d.get("config_save_interval", CONFIG_SAVE_INTERVAL),
+                "audio_cache_mb": d.get("audio_cache_mb", AUDIO_CACHE_BUDGET_MB),
+                "crossfade_sec": d.get("crossfade_sec", 0),
+                "normalize_loudness": d.get("normalize_loudness", True),
+                "work_layers": self._parse_layers(d.get("work_layers")),
+                "break_layers": self._parse_layers(d.get("break_layers")),
+                "suspend_policy": d.get("suspend_policy", "catch_up") if d.get("suspend_policy") in SUSPEND_POLICIES else "catch_up",
+                "control_server": d.get("control_server", True),
+                "overlay_renderer": d.get("overlay_renderer", "label") if d.get("overlay_renderer") in FloatingTimer.RENDERERS else "label",
+                "tray_progress": d.get("tray_progress", False),
+                "slider_preview_fps": self._parse_preview_fps(d.get("slider_preview_fps")),
+                "instrumentation": d.get("instrumentation", False)
             }
         except json.JSONDecodeError: return default
 
-    def save_config(self):
+    @staticmethod
+    def _parse_preview_fps(value) -> float:
+        """スライダーのプレビュー頻度。数値でなければ既定値、範囲外なら 1〜120 に収める"""
         try:
-            with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=4)
-        except IOError: pass
+            return min(120.0, max(1.0, float(value)))
+        except (TypeError, ValueError):
+            return SLIDER_PREVIEW_FPS
+
+    @staticmethod
+    def _parse_layers(value) -> list:
+        """設定ファイルのレイヤー一覧 [{"noise": メニュー名, "gain": 0.0-1.0}, ...] を検証する"""
+        layers = []
+        if isinstance(value, list):
+            for layer in value[:MAX_LAYERS]:
+                if not isinstance(layer, dict): continue
+                try:
+                    gain = min(1.0, max(0.0, float(layer.get("gain", 1.0))))
+                except (TypeError, ValueError):
+                    gain = 1.0
+                layers.append({"noise": str(layer.get("noise", "None")), "gain": gain})
+        return layers
+
+    def _save_checkpoint(self, snapshot):
+        # 単調時計の値は再起動をまたげないので、期限は UNIX 時刻で保存する
+        deadline = time.time() + snapshot.deadline - self.engine.clock() if snapshot.running else None
+        self.checkpoint_writer.submit(json.dumps({
+            "state": snapshot.state, "resume_state": snapshot.resume_state,
+            "remaining": snapshot.remaining, "deadline": deadline,
+        }))
+
+    def restore_checkpoint(self):
+        """前回異常終了したときのフェーズと残り時間を復元する"""
+        try:
+            with open(CHECKPOINT_FILE, 'r', encoding='utf-8') as f:
+                d = json.load(f)
+            deadline = d.get("deadline")
+            until_deadline = float(deadline) - time.time() if deadline is not None else None
+            self.engine.restore(d.get("state"), d.get("resume_state"), int(d.get("remaining", 0)), until_deadline)
+        except (OSError, ValueError, TypeError, AttributeError): pass
+
+    def save_config(self):
+        """設定を書き込み待ちにする。実際の書き込みはライタースレッドがまとめて行う"""
+        self.config_writer.submit(json.dumps(self.config, indent=4))
 
     def open_config_window(self):
         if self.floating_window:
             ConfigWindow(self.floating_window, self.floating_window)
 
+    def open_stats_window(self):
+        if self.floating_window:
+            StatsWindow(self.floating_window, self.stats)
+
     def open_credits(self):
         if os.path.exists(CREDITS_FILE):
-            try:
-                if os.name == 'nt':
-                    os.startfile(CREDITS_FILE)
-                else:
-                    opener = "open" if sys.platform == "darwin" else "xdg-open"
-                    subprocess.call([opener, CREDITS_FILE])
-            except Exception as e:
-                print(f"ファイルオープンエラー: {e}")
+            self._open_file(CREDITS_FILE)
+
+    @staticmethod
+    def _open_file(path):
+        try:
+            if os.name == 'nt':
+                os.startfile(path)
+            else:
+                opener = "open" if sys.platform == "darwin" else "xdg-open"
+                subprocess.call([opener, path])
+        except Exception as e:
+            print(f"ファイルオープンエラー: {e}")
 
-    def set_volume(self, volume):
+    def set_volume(self, volume, save=True):
         self.config["volume"] = volume
+        if not self._mixer_ready:
+            if save: self.save_config()
+            return
         try:
-            pygame.mixer.music.set_volume(volume)
+            # フェードアウト中のチャンネルには触れず、再生中の音源だけに反映する
+            pygame.mixer.music.set_volume(volume * self._current_gain)
+            if self._noise_channel: self._noise_channel.set_volume(volume * self._current_gain)
+            with self._layer_lock:
+                for index in self._active_layers:
+                    self._apply_layer_volume(index)
         except pygame.error: pass
-        self.save_config()
+        if save: self.save_config()
+
+    def set_normalize_loudness(self, enabled):
+        self.config["normalize_loudness"] = enabled
+        # 再生中の音源には音量の変更として反映する（再生し直さない）
+        self._current_gain = self._gain_for(self._current_source)
+        self.set_volume(self.config.get("volume", 1.0))
+
+    def _gain_for(self, file_path) -> float:
+        if not file_path or not self.config.get("normalize_loudness", True): return 1.0
+        return self._gains.get(file_path, 1.0)
 
     def set_noise_config(self, noise_type: str, noise_key: str):
         if noise_key not in self.available_noises: return
         self.config[f"{noise_type}_noise"] = noise_key
         self.save_config()
+        self._prefetch_noises(noise_key)
         if (self.state == self.STATE_WORK and noise_type == "work") or \
            (self.state == self.STATE_BREAK and noise_type == "break"):
-            self.play_sound_from_key(noise_key)
+            self._submit_sound(self.play_sound_from_key, noise_key, True)
         self._update_menu()
 
+    # --- レイヤー（主音源に重ねる音源） ---
+    def add_layer(self, noise_type):
+        layers = self.config.setdefault(f"{noise_type}_layers", [])
+        if len(layers) >= MAX_LAYERS: return
+        layers.append({"noise": "None", "gain": 1.0})
+        self.save_config()
+
+    def remove_layer(self, noise_type, index):
+        layers = self.config.get(f"{noise_type}_layers", [])
+        if not 0 <= index < len(layers): return
+        del layers[index]
+        self.save_config()
+        self._refresh_layers(noise_type)
+
+    def set_layer_noise(self, noise_type, index, noise_key):
+        layers = self.config.get(f"{noise_type}_layers", [])
+        if not 0 <= index < len(layers) or noise_key not in self.available_noises: return
+        layers[index]["noise"] = noise_key
+        self.save_config()
+        self._prefetch_noises(noise_key)
+        self._refresh_layers(noise_type)
+
+    def set_layer_gain(self, noise_type, index, gain, save=True):
+        layers = self.config.get(f"{noise_type}_layers", [])
+        if not 0 <= index < len(layers): return
+        layers[index]["gain"] = gain
+        if save: self.save_config()
+        # 再生中なら音量だけを変える（鳴らし直さない）
+        with self._layer_lock:
+            if self._is_current_phase(noise_type) and index in self._active_layers:
+                try: self._apply_layer_volume(index)
+                except pygame.error: pass
+
+    def _is_current_phase(self, noise_type) -> bool:
+        return (self.state == self.STATE_WORK and noise_type == "work") or \
+               (self.state == self.STATE_BREAK and noise_type == "break")
+
+    def _refresh_layers(self, noise_type):
+        if self._is_current_phase(noise_type):
+            self._play_layers(self.state)
+
+    def _play_layers(self, state, crossfade=False):
+        """フェーズのレイヤーを専用チャンネルで主音源と同時に鳴らす"""
+        if not self._mixer_ready or not self._layer_banks[0]: return
+        noise_type = "work" if state == self.STATE_WORK else "break"
+        fade_ms = int(self.config.get("crossfade_sec", 0) * 1000) if crossfade else 0
+        with self._layer_lock:
+            self._stop_layers(fade_ms)
+            if fade_ms > 0:
+                self._layer_bank ^= 1
+            self._layer_token += 1
+            self._layer_phase = noise_type
+            for index, layer in enumerate(self.config.get(f"{noise_type}_layers", [])[:MAX_LAYERS]):
+                file_path = self.available_noises.get(layer["noise"])
+                if file_path:
+                    self._start_layer(self._layer_token, index, file_path, fade_ms, 0)
+
+    def _start_layer(self, token, index, file_path, fade_ms, attempt):
+        with self._layer_lock:
+            if token != self._layer_token: return
+            channel = self._layer_banks[self._layer_bank][index]
+            self._active_layers[index] = (channel, file_path)
+            try:
+                if file_path.startswith(BUILTIN_NOISE_PREFIX):
+                    generator = NoiseGenerator(file_path[len(BUILTIN_NOISE_PREFIX):], channel, self.scheduler)
+                    self._layer_generators.append(generator)
+                    generator.start(self._layer_volume(index), fade_ms)
+                    return
+                # 複数の音源を同時に流せるのはデコード済みの Sound だけなので、キャッシュを待ってから鳴らす
+                playable = self._playable_path(file_path)
+                sound = self.audio_cache.get(playable)
+                if sound is None:
+                    self.audio_cache.prefetch(playable)
+                    if attempt < LAYER_RETRY_LIMIT:
+                        self.scheduler.call_later(LAYER_RETRY_SEC, self._start_layer, token, index, file_path, fade_ms, attempt + 1)
+                    return
+                channel.set_volume(self._layer_volume(index))
+                channel.play(sound, loops=-1, fade_ms=fade_ms)
+            except (pygame.error, ImportError, ValueError): pass
+
+    def _layer_volume(self, index) -> float:
+        """（_layer_lock を持って呼ぶ）"""
+        channel, file_path = self._active_layers[index]
+        layers = self.config.get(f"{self._layer_phase}_layers", [])
+        gain = layers[index]["gain"] if index < len(layers) else 1.0
+        return self.config.get("volume", 1.0) * gain * self._gain_for(file_path)
+
+    def _apply_layer_volume(self, index):
+        self._active_layers[index][0].set_volume(self._layer_volume(index))
+
+    def _stop_layers(self, fade_ms=0):
+        """鳴っているレイヤーを止める（fade_ms > 0 ならフェードアウト）"""
+        with self._layer_lock:
+            self._layer_token += 1
+            for generator in self._layer_generators:
+                generator.stop()
+            self._layer_generators = []
+            self._active_layers = {}
+            if fade_ms > 0:
+                for channel in self._layer_banks[self._layer_bank]: channel.fadeout(fade_ms)
+            else:
+                # フェードアウト中の前の組もあわせて止める
+                for bank in self._layer_banks:
+                    for channel in bank: channel.stop()
+
+    def set_crossfade(self, seconds):
+        self.config["crossfade_sec"] = seconds
+        self.save_config()
+
+    def set_suspend_policy(self, policy):
+        if policy not in SUSPEND_POLICIES: return
+        self.config["suspend_policy"] = policy
+        self.engine.suspend_policy = policy
+        self.save_config()
+
     def toggle_timer_display(self):
         current = self.config.get("show_timer", False)
         new_state = not current
@@ -779,144 +3496,311 @@ class PomodoroTimer:
             self.floating_window.toggle_visibility(new_state)
         self._update_menu()
 
-    def play_sound_from_key(self, noise_key: str):
+    def toggle_tray_progress(self):
+        new_state = not self.config.get("tray_progress", False)
+        self.config["tray_progress"] = new_state
+        self.save_config()
+        if self.tray_progress:
+            self.tray_progress.set_enabled(new_state)
+        self._update_menu()
+
+    def play_sound_from_key(self, noise_key: str, crossfade=False):
+        if not self._assets_ready.is_set():
+            self._assets_ready.wait(1.0)
         file_path = self.available_noises.get(noise_key)
+        if not self._mixer_ready:
+            # 無音のままなら pygame を読み込む必要はない
+            if not file_path or not self._init_pygame(): return
+        # 音量補正の倍率は測定済みの値を引くだけで、再生時には解析しない
+        self._current_source = file_path
+        self._current_gain = self._gain_for(file_path)
+        file_path = self._playable_path(file_path)
+        volume = self.config.get("volume", 1.0) * self._current_gain
+        fade_ms = int(self.config.get("crossfade_sec", 0) * 1000) if crossfade else 0
+        builtin = bool(file_path) and file_path.startswith(BUILTIN_NOISE_PREFIX)
+        t_play = METRICS.start()
+        self._stop_generator()
         try:
-            pygame.mixer.music.stop()
-            pygame.mixer.music.set_volume(self.config.get("volume", 1.0))
-            if file_path and os.path.exists(file_path):
+            sound = self.audio_cache.get(file_path) if file_path and not builtin else None
+            if fade_ms > 0 and self._noise_channel:
+                # 旧音源はフェードアウトさせ、新音源はもう一方のチャンネルでフェードインさせる。
+                # ゲインの変化は SDL_mixer がサンプル単位で計算するため Python 側の負荷はない
+                self._noise_channel.fadeout(fade_ms)
+                if sound is None and file_path and not builtin:
+                    # ストリーミング同士は重ねられないので、旧ストリームは切る
+                    pygame.mixer.music.stop()
+                else:
+                    pygame.mixer.music.fadeout(fade_ms)
+                self._noise_channel = self._noise_channels[1] if self._noise_channel is self._noise_channels[0] else self._noise_channels[0]
+            else:
+                # 主音源だけを切り替える。レイヤーはそのまま鳴らし続ける
+                self._stop_main_sound()
+
+            if builtin and self._noise_channel:
+                # 内蔵ノイズはディスクを読まずにその場で合成して流し続ける
+                try:
+                    self._generator = NoiseGenerator(file_path[len(BUILTIN_NOISE_PREFIX):], self._noise_channel, self.scheduler)
+                    self._generator.start(volume, fade_ms)
+                except (ImportError, ValueError):
+                    self._generator = None
+            elif sound is not None and self._noise_channel:
+                # デコード済みならディスクを読まずに即座に再生できる
+                self._noise_channel.set_volume(volume)
+                self._noise_channel.play(sound, loops=-1, fade_ms=fade_ms)
+            elif file_path and os.path.exists(file_path):
+                # 未キャッシュ（上限超過含む）の場合は従来通りストリーミング再生
+                pygame.mixer.music.set_volume(volume)
+                t_load = METRICS.start()
                 pygame.mixer.music.load(file_path)
-                pygame.mixer.music.play(-1)
+                METRICS.stop("sound.load", t_load, noise=noise_key)
+                pygame.mixer.music.play(-1, fade_ms=fade_ms)
+                self.audio_cache.prefetch(file_path)
         except pygame.error: pass
+        METRICS.stop("sound.play", t_play, noise=noise_key, cached=sound is not None, fade_ms=fade_ms)
+        # 現在のフェーズ中に次のフェーズの音源を先読みしておく
+        if self.state == self.STATE_WORK:
+            self._prefetch_noises(*self._phase_noise_keys("break"))
+        elif self.state == self.STATE_BREAK:
+            self._prefetch_noises(*self._phase_noise_keys("work"))
+
+    def _stop_generator(self):
+        if self._generator:
+            self._generator.stop()
+            self._generator = None
+
+    def _stop_main_sound(self):
+        self._stop_generator()
+        pygame.mixer.music.stop()
+        for channel in self._noise_channels: channel.stop()
 
     def stop_sound(self):
-        try: pygame.mixer.music.stop()
+        if not self._mixer_ready: return
+        try:
+            self._stop_main_sound()
+            self._stop_layers()
         except pygame.error: pass
 
-    def start_pomodoro(self):
-        if self.state == self.STATE_WORK or self.state == self.STATE_BREAK: return
-        sound_key = "None"
-        if self.state == self.STATE_STOPPED:
-            self.state = self.STATE_WORK
-            self.remaining_time = WORK_DURATION
-            sound_key = self.config.get("work_noise")
-        elif self.state == self.STATE_PAUSED:
-            self.state = self.resume_state
-            if self.state == self.STATE_WORK: sound_key = self.config.get("work_noise")
-            elif self.state == self.STATE_BREAK: sound_key = self.config.get("break_noise")
-        
-        self.end_time = time.time() + self.remaining_time
-        self.play_sound_from_key(sound_key)
-        self.stop_event.clear()
-        self.timer_thread = threading.Thread(target=self.run_timer, daemon=True)
-        self.timer_thread.start()
-        self._update_menu()
+    # --- タイマー状態（TimerEngine への委譲） ---
+    @property
+    def state(self): return self.engine.state
 
-    def stop_pomodoro(self):
-        if self.state == self.STATE_STOPPED or self.state == self.STATE_PAUSED: return
-        self.resume_state = self.state
-        self.state = self.STATE_PAUSED
-        self.stop_event.set()
-        if self.timer_thread:
-            self.timer_thread.join()
-            self.timer_thread = None
-        self.stop_sound()
-        self._update_menu()
+    @property
+    def resume_state(self): return self.engine.resume_state
 
-    def reset_timer(self):
-        self.stop_event.set()
-        if self.timer_thread:
-            self.timer_thread.join()
-            self.timer_thread = None
-        self.stop_sound()
-        self.state = self.STATE_STOPPED
-        self.remaining_time = WORK_DURATION
-        self._update_menu()
+    @property
+    def end_time(self): return self.engine.end_time
 
-    # --- リスタート機能 ---
-    def restart_and_pause(self):
-        """現在のセッションを初期化し、一時停止状態で待機する"""
-        if self.state == self.STATE_STOPPED: return
+    @property
+    def remaining_time(self) -> int: return self.engine.remaining_time
 
-        if self.state in [self.STATE_WORK, self.STATE_BREAK]:
-            self.resume_state = self.state
-        
-        if self.resume_state == self.STATE_WORK:
-            self.remaining_time = WORK_DURATION
-        else:
-            self.remaining_time = BREAK_DURATION
-        
-        self.state = self.STATE_PAUSED
-        self.stop_event.set()
-        if self.timer_thread:
-            self.timer_thread.join()
-            self.timer_thread = None
-        self.stop_sound()
-        self._update_menu()
+    def next_tick_delay(self) -> float: return self.engine.next_tick_delay()
 
-    def run_timer(self):
-        while not self.stop_event.is_set():
-            if self.stop_event.wait(0.1): break
-            if self.state == self.STATE_STOPPED or self.state == self.STATE_PAUSED: break
-            
-            now = time.time()
-            remaining_seconds = self.end_time - now
-            self.remaining_time = int(remaining_seconds + 0.9) 
-
-            if remaining_seconds <= 0:
-                self.remaining_time = 0
-                self._transition_state()
-                if self.state in [self.STATE_WORK, self.STATE_BREAK]:
-                    self.end_time = time.time() + self.remaining_time
-                else:
-                    break
+    def start_pomodoro(self): self.engine.start_pomodoro()
 
-    def _transition_state(self):
-        if self.state == self.STATE_WORK:
-            self.state = self.STATE_BREAK
-            self.remaining_time = BREAK_DURATION
-            self.play_sound_from_key(self.config.get("break_noise"))
-        elif self.state == self.STATE_BREAK:
-            self.state = self.STATE_WORK
-            self.remaining_time = WORK_DURATION
-            self.play_sound_from_key(self.config.get("work_noise"))
-        self._update_menu()
+    def stop_pomodoro(self): self.engine.stop_pomodoro()
+
+    def reset_timer(self): self.engine.reset_timer()
+
+    def restart_and_pause(self): self.engine.restart_and_pause()
+
+    # --- TimerEngine からの通知 ---
+    def _submit_sound(self, callback, *args):
+        """音の切り替えを音声スレッドに積む（終了処理後は捨てる）"""
+        try:
+            self._sound_executor.submit(callback, *args)
+        except RuntimeError: pass
+
+    def on_timer_event(self, snapshot):
+        """状態に合わせて音を鳴らす・止める（音声スレッド）"""
+        # 連続した操作で後続のスナップショットが届いているなら、途中の状態の音は鳴らさない
+        if snapshot is not self.events.latest: return
+        if snapshot.running:
+            self.play_phase_sound(snapshot.state, crossfade=snapshot.transition)
+        else:
+            self.stop_sound()
+
+    def play_phase_sound(self, state, crossfade=False):
+        noise_type = "work" if state == self.STATE_WORK else "break"
+        self.play_sound_from_key(self.config.get(f"{noise_type}_noise"), crossfade=crossfade)
+        try: self._play_layers(state, crossfade=crossfade)
+        except pygame.error: pass
 
     def _update_menu(self):
-        if self.icon:
-            try: self.icon.update_menu()
-            except Exception: pass
+        """トレイメニューの更新を予約する。続けて届いた要求は1回の更新にまとめる"""
+        if not self.icon: return
+        with self._menu_lock:
+            if self._menu_update_pending: return
+            self._menu_update_pending = True
+        self.scheduler.call_later(MENU_UPDATE_DELAY, self._flush_menu)
+
+    def _flush_menu(self):
+        with self._menu_lock:
+            self._menu_update_pending = False
+        t0 = METRICS.start()
+        try: self.icon.update_menu()
+        except Exception: pass
+        METRICS.stop("tray.update_menu", t0, thread=threading.current_thread().name)
+
+    def dump_metrics(self, open_file=True):
+        """計測データを書き出す（計測が有効なときのみ）。open_file なら書き出したファイルを開く"""
+        if not METRICS.enabled: return
+        try:
+            path = METRICS.dump()
+        except OSError: return
+        if open_file: self._open_file(path)
 
     def get_menu_state_text(self) -> str:
+        # トレイのスレッドからも一貫した状態を読めるよう、最新のスナップショットから作る
+        snapshot = self.events.latest
         st_text = ""
-        if self.state == self.STATE_STOPPED: st_text = tr("state_stopped")
-        elif self.state == self.STATE_WORK: st_text = tr("state_work")
-        elif self.state == self.STATE_BREAK: st_text = tr("state_break")
-        elif self.state == self.STATE_PAUSED: st_text = tr("state_paused")
+        if snapshot.state == self.STATE_STOPPED: st_text = tr("state_stopped")
+        elif snapshot.state == self.STATE_WORK: st_text = tr("state_work")
+        elif snapshot.state == self.STATE_BREAK: st_text = tr("state_break")
+        elif snapshot.state == self.STATE_PAUSED: st_text = tr("state_paused")
         
-        if self.state == self.STATE_STOPPED:
+        if snapshot.state == self.STATE_STOPPED:
             return tr("status_fmt").format(state=st_text, time="--:--")
         
-        mins, secs = divmod(max(0, self.remaining_time), 60)
-        time_str = f"{mins:02d}:{secs:02d}"
-        return tr("status_fmt").format(state=st_text, time=time_str)
+        return tr("status_fmt").format(state=st_text, time=format_time(snapshot.remaining_at(self.engine.clock())))
 
     def get_start_stop_text(self) -> str:
-        if self.state == self.STATE_STOPPED: return tr("start")
-        elif self.state == self.STATE_PAUSED: return tr("resume")
+        state = self.events.latest.state
+        if state == self.STATE_STOPPED: return tr("start")
+        elif state == self.STATE_PAUSED: return tr("resume")
         else: return tr("pause")
 
     def quit_app(self):
-        self.stop_event.set()
-        if self.timer_thread: self.timer_thread.join()
-        pygame.mixer.quit()
+        self.scheduler.shutdown()
+        # 切り替え中の音があれば終わるのを待ってからミキサーを閉じる
+        self._sound_executor.shutdown(wait=True, cancel_futures=True)
+        if self.control: self.control.stop()
+        self.config_writer.close()
+        # 自分で終了したときは次回に再開しない
+        self.events.unsubscribe(self._save_checkpoint)
+        self.checkpoint_writer.submit(json.dumps({"state": self.STATE_STOPPED}))
+        self.checkpoint_writer.close()
+        self.history.close()
+        self.stats.close()
+        METRICS.close()
+        self.audio_cache.shutdown()
+        if self._asset_pool: self._asset_pool.shutdown(wait=False, cancel_futures=True)
+        if self._mixer_ready: pygame.mixer.quit()
         if self.icon: self.icon.stop()
         if self.floating_window: self.floating_window.quit()
 
+# =========================================
+# クラス定義: トレイアイコンの進捗表示（フレームキャッシュ）
+# =========================================
+class TrayProgressIcon:
+    """
+    トレイアイコンに進捗リングと残り分数を表示する。
+    フレームはフェーズと残り分数ごとに PIL で一度だけ描いて保持し、
+    分の境界ではキャッシュ済みの画像に差し替えるだけにする（スケジューラスレッド）。
+    """
+    SIZE = 64
+    SCALE = 4  # 拡大して描いてから縮小し、輪郭を滑らかにする
+    RING_WIDTH = 9
+    MAX_FRAMES = 96  # 64px の RGBA で 1 枚 16KB、合計 1.5MB まで
+    TRACK_COLOR = (48, 48, 48, 255)
+    FILL_COLOR = (24, 24, 24, 220)  # 明るいタスクバーでも数字が読めるように下地を敷く
+    TEXT_COLOR = (255, 255, 255, 255)
+
+    def __init__(self, icon, static_image, scheduler, engine):
+        self.icon = icon
+        self.static_image = static_image
+        self.scheduler = scheduler
+        self.engine = engine
+        self.font = None  # 有効にするまでは描画用のモジュールもフォントも読み込まない
+        self.frames = OrderedDict()  # (paused, phase, minutes) -> Image（LRU）
+        self.enabled = False
+        self._snapshot = engine.events.latest
+        self._handle = None
+        self._shown = None  # 表示中のフレームのキー（None は通常のアイコン）
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.scheduler.call_soon(self._refresh)
+
+    def on_timer_event(self, snapshot):
+        if snapshot.version < self._snapshot.version: return
+        self._snapshot = snapshot
+        self._refresh()
+
+    def _phase_minutes(self, phase) -> int:
+        duration = self.engine.work_duration if phase == PomodoroTimer.STATE_WORK else self.engine.break_duration
+        return max(1, math.ceil(duration / 60))
+
+    def _refresh(self):
+        """表示すべきフレームに差し替え、計測中なら次の分の境界で再実行する"""
+        if self._handle is not None:
+            self.scheduler.cancel(self._handle)
+            self._handle = None
+        snapshot = self._snapshot
+        if not self.enabled or snapshot.state == PomodoroTimer.STATE_STOPPED:
+            self._show(None)
+            return
+        paused = snapshot.state == PomodoroTimer.STATE_PAUSED
+        phase = snapshot.resume_state if paused else snapshot.state
+        now = self.engine.clock()
+        key = (paused, phase, math.ceil(snapshot.remaining_at(now) / 60))
+        if not paused and key not in self.frames:
+            # フェーズの最初に全フレームを描いておき、以降の分の境界では描画しない
+            for minutes in range(self._phase_minutes(phase) + 1):
+                self._frame((False, phase, minutes))
+        self._show(key)
+        if snapshot.running and snapshot.deadline > now:
+            delay = (snapshot.deadline - now) % 60 or 60
+            self._handle = self.scheduler.call_later(delay, self._refresh)
+
+    def _show(self, key):
+        if key == self._shown: return
+        self._shown = key
+        image = self.static_image if key is None else self._frame(key)
+        try: self.icon.icon = image
+        except Exception: pass  # バックエンドによっては終了処理中に失敗する
+
+    def _frame(self, key):
+        image = self.frames.get(key)
+        if image is not None:
+            self.frames.move_to_end(key)
+            return image
+        image = self.frames[key] = self.render(*key)
+        while len(self.frames) > self.MAX_FRAMES:
+            self.frames.popitem(last=False)
+        return image
+
+    def render(self, paused, phase, minutes):
+        """リングと残り分数を描いた1フレーム"""
+        t0 = METRICS.start()
+        big = self.SIZE * self.SCALE
+        if self.font is None:
+            from PIL import Image, ImageDraw, ImageFont
+            self.Image, self.ImageDraw = Image, ImageDraw
+            self.font = load_bold_font(ImageFont, int(big * 0.36))
+        image = self.Image.new("RGBA", (big, big), (0, 0, 0, 0))
+        draw = self.ImageDraw.Draw(image)
+        width = self.RING_WIDTH * self.SCALE
+        box = (width // 2, width // 2, big - width // 2 - 1, big - width // 2 - 1)
+        color = FloatingTimer.COLOR_PAUSE if paused else (
+            FloatingTimer.COLOR_WORK if phase == PomodoroTimer.STATE_WORK else FloatingTimer.COLOR_BREAK)
+        draw.ellipse(box, fill=self.FILL_COLOR, outline=self.TRACK_COLOR, width=width)
+        fraction = min(1.0, minutes / self._phase_minutes(phase))
+        if fraction > 0:
+            draw.arc(box, -90, -90 + 360 * fraction, fill=color, width=width)
+        draw.text((big / 2, big / 2), str(minutes), font=self.font, fill=self.TEXT_COLOR, anchor="mm")
+        image = image.resize((self.SIZE, self.SIZE), self.Image.LANCZOS)
+        METRICS.stop("tray.frame_render", t0)
+        return image
+
+
 # =========================================
 # タスクトレイアイコンの設定・実行
 # =========================================
 def run_tray_icon(timer_app):
+    with PROFILER.phase("import:pystray+PIL"):
+        from PIL import Image
+        import pystray
+
     def on_start_stop(icon, item):
         if timer_app.state in [PomodoroTimer.STATE_WORK, PomodoroTimer.STATE_BREAK]:
             timer_app.stop_pomodoro()
@@ -926,12 +3810,22 @@ def run_tray_icon(timer_app):
     def on_reset(icon, item): timer_app.reset_timer()
     def on_quit(icon, item): timer_app.quit_app()
     def on_toggle_display(icon, item): timer_app.toggle_timer_display()
+    def on_toggle_progress(icon, item): timer_app.toggle_tray_progress()
     def on_open_credits(icon, item): timer_app.open_credits()
+    def on_dump_metrics(icon, item): timer_app.dump_metrics()
     
     def on_open_settings(icon, item):
         if timer_app.floating_window:
             timer_app.floating_window.after(0, timer_app.open_config_window)
 
+    def on_open_stats(icon, item):
+        if timer_app.floating_window:
+            timer_app.floating_window.after(0, timer_app.open_stats_window)
+
+    def on_icon_ready(icon):
+        icon.visible = True
+        PROFILER.mark("tray_visible")
+
     def create_noise_callback(type_, key):
         return lambda icon, item: timer_app.set_noise_config(type_, key)
     
@@ -941,16 +3835,30 @@ def run_tray_icon(timer_app):
     def is_display_checked(item):
         return timer_app.config.get("show_timer", False)
 
-    def generate_noise_menu(type_):
+    def is_progress_checked(item):
+        return timer_app.config.get("tray_progress", False)
+
+    def generate_noise_menu(type_, noises):
         key = "None"
         display_key = tr("none")
         
-        if key in timer_app.available_noises:
+        if key in noises:
             yield pystray.MenuItem(display_key, create_noise_callback(type_, key), checked=is_noise_checked(type_, key), radio=True)
         
-        for key in sorted([k for k in timer_app.available_noises if k != "None"]):
+        for key in sorted([k for k in noises if k != "None"]):
             yield pystray.MenuItem(key, create_noise_callback(type_, key), checked=is_noise_checked(type_, key), radio=True)
 
+    noise_menu_cache = {}  # type_ -> (available_noises, メニュー項目のタプル)
+
+    def noise_menu_items(type_):
+        """ノイズ選択のメニュー項目。音源ライブラリが変わったときだけ作り直す"""
+        noises = timer_app.available_noises
+        cached = noise_menu_cache.get(type_)
+        # available_noises は変更時に辞書ごと差し替えられるので、同一性で変化を判定できる
+        if cached is None or cached[0] is not noises:
+            cached = noise_menu_cache[type_] = (noises, tuple(generate_noise_menu(type_, noises)))
+        return cached[1]
+
     menu = pystray.Menu(
         pystray.MenuItem(lambda text: timer_app.get_start_stop_text(), on_start_stop, default=True),
         pystray.MenuItem(tr("stop_timer"), on_reset),
@@ -958,45 +3866,79 @@ def run_tray_icon(timer_app):
         pystray.MenuItem(lambda text: timer_app.get_menu_state_text(), None, enabled=False),
         pystray.Menu.SEPARATOR,
         pystray.MenuItem(tr("show_timer"), on_toggle_display, checked=is_display_checked),
+        pystray.MenuItem(tr("tray_progress"), on_toggle_progress, checked=is_progress_checked),
         pystray.MenuItem(tr("settings_menu"), on_open_settings),
+        pystray.MenuItem(tr("stats_menu"), on_open_stats),
         pystray.Menu.SEPARATOR,
-        pystray.MenuItem(tr("work_noise"), pystray.Menu(lambda: generate_noise_menu("work"))),
-        pystray.MenuItem(tr("break_noise"), pystray.Menu(lambda: generate_noise_menu("break"))),
+        pystray.MenuItem(tr("work_noise"), pystray.Menu(lambda: noise_menu_items("work"))),
+        pystray.MenuItem(tr("break_noise"), pystray.Menu(lambda: noise_menu_items("break"))),
         pystray.Menu.SEPARATOR,
         pystray.MenuItem(tr("credits"), on_open_credits),
+        pystray.MenuItem(tr("dump_metrics"), on_dump_metrics, visible=lambda item: METRICS.enabled),
         pystray.Menu.SEPARATOR,
         pystray.MenuItem(tr("quit"), on_quit)
     )
 
-    try:
-        icon_image = Image.open(ICON_FILE)
-    except Exception:
-        icon_image = Image.new('RGBA', (64, 64), (0,0,0,0))
-        
-    icon = pystray.Icon(APP_NAME, icon_image, APP_NAME, menu)
+    with PROFILER.phase("init:tray_icon"):
+        try:
+            icon_image = Image.open(ICON_FILE)
+        except Exception:
+            icon_image = Image.new('RGBA', (64, 64), (0,0,0,0))
+            
+        icon = pystray.Icon(APP_NAME, icon_image, APP_NAME, menu)
     timer_app.icon = icon
-    icon.run()
+    timer_app.tray_progress = TrayProgressIcon(icon, icon_image, timer_app.scheduler, timer_app.engine)
+    timer_app.events.subscribe(timer_app.tray_progress.on_timer_event, dispatch=timer_app.scheduler.call_soon)
+    if timer_app.config.get("tray_progress", False):
+        timer_app.tray_progress.set_enabled(True)
+    icon.run(setup=on_icon_ready)
 
 # =========================================
 # メインエントリーポイント
 # =========================================
 def main():
-    app = PomodoroTimer()
+    if "--profile-startup" in sys.argv:
+        PROFILER.enable()
+
+    with PROFILER.phase("init:PomodoroTimer"):
+        app = PomodoroTimer()
+
+    if "--trace" in sys.argv or app.config.get("instrumentation", False):
+        METRICS.enable()
+        # POSIX では SIGUSR1 でいつでも集計結果を書き出せるようにする。
+        # ハンドラー内ではファイルに触れず、書き出しはスケジューラスレッドに任せる（ビューアーは開かない）
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: app.scheduler.call_soon(app.dump_metrics, False))
     
-    tray_thread = threading.Thread(target=run_tray_icon, args=(app,), daemon=True)
+    # トレイアイコンとオーバーレイを先に出し、音源スキャンはその後ろで行う
+    tray_thread = threading.Thread(target=run_tray_icon, args=(app,), name="LeanFocusTray", daemon=True)
     tray_thread.start()
 
-    app.floating_window = FloatingTimer(app)
-    
-    if app.config.get("show_timer", False):
-        app.floating_window.deiconify()
-        app.floating_window.is_visible = True
-        app.floating_window.refresh_layout()
-    else:
-        app.floating_window.withdraw()
-        app.floating_window.is_visible = False
+    # 外部のステータスバーやスクリプトから操作・購読できるようにする
+    if app.config.get("control_server", True):
+        app.control = ControlServer(app)
+        app.control.start()
+
+    with PROFILER.phase("init:FloatingTimer"):
+        app.floating_window = FloatingTimer(app)
         
+        if app.config.get("show_timer", False):
+            app.floating_window.deiconify()
+            app.floating_window.is_visible = True
+            app.floating_window.refresh_layout()
+        else:
+            app.floating_window.withdraw()
+            app.floating_window.is_visible = False
+
+    app.scan_assets_async()
+    app.restore_checkpoint()
+    app.load_stats_async()
+    if METRICS.enabled:
+        app.floating_window.start_stall_probe()
+    app.floating_window.after_idle(PROFILER.mark, "overlay_ready")
     app.floating_window.mainloop()
 
 if __name__ == "__main__":
+    # PyInstaller でビルドした実行ファイルからワーカープロセスを起動するために必要
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
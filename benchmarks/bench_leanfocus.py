@@ -0,0 +1,573 @@
+# -*- coding: utf-8 -*-
+"""
+LeanFocus のホットパスのベンチマーク。
+
+    python benchmarks/bench_leanfocus.py                 # すべて実行
+    python benchmarks/bench_leanfocus.py --quick         # 短時間版
+    python benchmarks/bench_leanfocus.py --only scan_assets,save_config
+
+pystray は常にスタブを使う（メニュー生成の Python 側のコストだけを計測する）。
+pygame / PIL はインストール済みなら実物（SDL はダミーオーディオ）を、無ければスタブを使う。
+Tk を使う計測は DISPLAY が無ければ Xvfb を自動で起動し、どちらも無ければスキップする。
+結果は 1 回の実行につき 1 行の JSON として benchmarks/results.jsonl に追記する。
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import wave
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results.jsonl")
+
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+import stub_backends  # noqa: E402
+from leanfocus_control import auth_line  # noqa: E402
+
+LeanFocus = None  # setup_backends() の後で読み込む
+
+
+# =========================================
+# 共通ヘルパー
+# =========================================
+def summarize(samples_sec):
+    """秒単位のサンプル列をミリ秒の統計値にまとめる"""
+    if not samples_sec:
+        return {"n": 0}
+    ordered = sorted(samples_sec)
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 4),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 4),
+        "max_ms": round(ordered[-1] * 1000, 4),
+    }
+
+
+def counting(func, counter, key):
+    """呼び出し回数を counter[key] に数えるラッパー"""
+    def wrapper(*args, **kwargs):
+        counter[key] = counter.get(key, 0) + 1
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def write_silence_wav(path, seconds=1.0, rate=44100):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(b"\0\0\0\0" * int(rate * seconds))
+
+
+def new_app(noise_files=()):
+    """作業ディレクトリ直下の assets/sounds を使う PomodoroTimer を作る"""
+    os.makedirs(LeanFocus.SOUND_DIR, exist_ok=True)
+    for name in noise_files:
+        write_silence_wav(os.path.join(LeanFocus.SOUND_DIR, name))
+    app = LeanFocus.PomodoroTimer()
+    app._load_assets()
+    return app
+
+
+@contextlib.contextmanager
+def idle_cpu(result, duration):
+    """メインスレッドを眠らせ、その間のプロセスCPU時間を 1 時間あたりに換算する"""
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    yield
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+    result["wall_sec"] = round(wall, 3)
+    result["cpu_sec_per_hour"] = round(cpu / wall * 3600, 3)
+
+
+# =========================================
+# ベンチマーク本体
+# =========================================
+def bench_timer_wakeups(quick):
+    """計測中のスケジューラスレッドの起床回数とCPU時間"""
+    duration = 3.0 if quick else 15.0
+    app = new_app()
+    counter = {}
+    cond = app.scheduler._cond
+    cond.wait = counting(cond.wait, counter, "wakeups")
+    app.start_pomodoro()
+    counter.clear()
+    result = {}
+    with idle_cpu(result, duration):
+        time.sleep(duration)
+    app.quit_app()
+    result["wakeups_per_sec"] = round(counter.get("wakeups", 0) / result["wall_sec"], 3)
+    return result
+
+
+def bench_overlay_render(quick):
+    """計測中のオーバーレイ再描画の回数・ウィジェット更新・ジオメトリ計算とCPU時間"""
+    import tkinter as tk
+    duration = 3.0 if quick else 10.0
+    app = new_app()
+    try:
+        win = LeanFocus.FloatingTimer(app)
+    except tk.TclError as e:
+        app.quit_app()
+        return {"skipped": f"Tk unavailable: {e}"}
+    app.floating_window = win
+    win.toggle_visibility(True)
+
+    counter = {}
+    win.update_timer_display = counting(win.update_timer_display, counter, "callbacks")
+    win._fit_window_size = counting(win._fit_window_size, counter, "geometry_fits")
+    for label in (win.label_normal, win.label_pause_time):
+        label.config = counting(label.config, counter, "widget_updates")
+
+    app.start_pomodoro()
+    win.update()
+    counter.clear()
+    result = {}
+    win.after(int(duration * 1000), win.quit)
+    with idle_cpu(result, duration):
+        win.mainloop()
+    app.floating_window = None
+    app.quit_app()
+    win.destroy()
+    for key in ("callbacks", "widget_updates", "geometry_fits"):
+        result[f"{key}_per_sec"] = round(counter.get(key, 0) / result["wall_sec"], 3)
+    return result
+
+
+def bench_opacity_preview(quick):
+    """透明度スライダーのプレビュー1回のコストと、画像レンダラーのグリフキャッシュが保たれること"""
+    import tkinter as tk
+    ticks = 60 if quick else 300
+    app = new_app()
+    try:
+        win = LeanFocus.FloatingTimer(app)
+    except tk.TclError as e:
+        app.quit_app()
+        return {"skipped": f"Tk unavailable: {e}"}
+    app.floating_window = win
+    win.set_renderer("image", save=False)
+    renderer = win.image_renderer
+    if renderer is None:
+        app.floating_window = None
+        app.quit_app()
+        win.destroy()
+        return {"skipped": "PIL unavailable"}
+    win.toggle_visibility(True)
+    app.start_pomodoro()
+    win.update()
+
+    counter = {}
+    renderer.clear = counting(renderer.clear, counter, "cache_clears")
+    win.refresh_layout = counting(win.refresh_layout, counter, "relayouts")
+    tiles = dict(renderer._tiles)
+    samples = []
+    for i in range(ticks):
+        # SliderPreview の preview と同じく保存せずに反映する
+        t0 = time.perf_counter()
+        win.apply_visual_settings(win.font_size, 0.5 + (i % 50) / 100, save=False)
+        win.update_idletasks()
+        samples.append(time.perf_counter() - t0)
+    result = summarize(samples)
+    result["cache_clears"] = counter.get("cache_clears", 0)
+    result["relayouts"] = counter.get("relayouts", 0)
+    result["tiles_kept"] = sum(1 for key, tile in tiles.items() if renderer._tiles.get(key) is tile)
+    result["tiles_before"] = len(tiles)
+    app.floating_window = None
+    app.quit_app()
+    win.destroy()
+    return result
+
+
+def bench_transition_latency(quick):
+    """フェーズ期限からスケジューラ起床・音声再生開始までの遅延（キャッシュ済み / ストリーミング）"""
+    transitions = 10 if quick else 40
+    phase_sec = 0.05
+    result = {}
+    for variant in ("cached", "streamed"):
+        app = new_app(noise_files=("bench_work.wav", "bench_break.wav"))
+        app.config.update(work_noise="bench_work", break_noise="bench_break")
+        if variant == "streamed":
+            app.audio_cache.budget_bytes = 0
+        app.engine.work_duration = app.engine.break_duration = phase_sec
+
+        wake, sound = [], []
+        deadline = {}
+        engine = app.engine
+        original_deadline = engine._on_phase_deadline
+        original_play = app.play_sound_from_key
+
+        def on_deadline(token):
+            deadline["t"] = engine.end_time
+            wake.append(engine.clock() - engine.end_time)
+            original_deadline(token)
+
+        def play(noise_key, crossfade=False):
+            original_play(noise_key, crossfade)
+            if "t" in deadline:
+                sound.append(engine.clock() - deadline.pop("t"))
+
+        engine._on_phase_deadline = on_deadline
+        app.play_sound_from_key = play
+
+        app.start_pomodoro()
+        if variant == "cached":
+            # 先読みが終わるまで待ってから計測を始める
+            for _ in range(200):
+                if all(app.audio_cache.get(path) for path in app.available_noises.values() if path): break
+                time.sleep(0.01)
+        wake.clear(); sound.clear()
+        time.sleep(phase_sec * (transitions + 1))
+        app.quit_app()
+        result[variant] = {"scheduler_wake": summarize(wake[:transitions]), "sound_start": summarize(sound[:transitions])}
+    return result
+
+
+def bench_scan_assets(quick):
+    """音源ライブラリのサイズごとの走査時間（初回 / マニフェストあり / 変更確認）"""
+    sizes = (10, 100, 1000) if quick else (10, 100, 1000, 10000)
+    result = {}
+    for size in sizes:
+        lib_dir = os.path.join(os.getcwd(), f"library_{size}")
+        os.makedirs(lib_dir, exist_ok=True)
+        for i in range(size):
+            with open(os.path.join(lib_dir, f"noise_{i:05d}.mp3"), "wb") as f:
+                f.write(b"\0")
+        names_file = os.path.join(lib_dir, "sound_names.json")
+        manifest_file = os.path.join(lib_dir, "manifest.json")
+
+        def timed_scan():
+            lib = LeanFocus.AssetLibrary(lib_dir, names_file, manifest_file)
+            t0 = time.perf_counter()
+            lib.scan()
+            noises = lib.noises()
+            return time.perf_counter() - t0, lib, noises
+
+        cold, _, noises = timed_scan()
+        warm, lib, _ = timed_scan()
+        t0 = time.perf_counter()
+        for _ in range(100):
+            lib.is_stale()
+        stale_check = (time.perf_counter() - t0) / 100
+        result[str(size)] = {
+            "entries": len(noises) - 1,
+            "cold_scan_ms": round(cold * 1000, 3),
+            "manifest_scan_ms": round(warm * 1000, 3),
+            "stale_check_ms": round(stale_check * 1000, 4),
+        }
+    return result
+
+
+def bench_save_config(quick):
+    """スライダーのドラッグを模した set_volume 連打時の呼び出しコストと実際の書き込み回数"""
+    drags = 2 if quick else 10
+    rate_hz, drag_sec = 60, 2.0
+    app = new_app()
+    counter = {}
+    original_write = LeanFocus.write_file_atomic
+    LeanFocus.write_file_atomic = counting(original_write, counter, "disk_writes")
+    try:
+        calls = []
+        steps = int(rate_hz * drag_sec)
+        for _ in range(drags):
+            for i in range(steps):
+                t0 = time.perf_counter()
+                app.set_volume(i / steps)
+                calls.append(time.perf_counter() - t0)
+                time.sleep(1 / rate_hz)
+        app.config_writer.flush()
+        app.quit_app()
+    finally:
+        LeanFocus.write_file_atomic = original_write
+    return {
+        "calls": len(calls),
+        "call_cost": summarize(calls),
+        "disk_writes": counter.get("disk_writes", 0),
+        "drag_sec_total": drags * drag_sec,
+    }
+
+
+def bench_update_menu(quick):
+    """ノイズの登録数ごとの icon.update_menu のコスト（pystray スタブでの Python 側の処理）"""
+    sizes = (10, 100, 1000) if quick else (10, 100, 1000, 5000)
+    repeat = 20 if quick else 50
+    result = {}
+    for size in sizes:
+        app = new_app()
+        app.available_noises = {"None": None}
+        app.available_noises.update({f"noise {i:05d}": f"noise_{i:05d}.mp3" for i in range(size)})
+        LeanFocus.run_tray_icon(app)
+        samples, items = [], 0
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            items = app.icon.update_menu()
+            samples.append(time.perf_counter() - t0)
+
+        # 状態変化が立て続けに起きたときに、ネイティブメニューの更新が何回走るか
+        refreshes = []
+        native_update = app.icon.update_menu
+        app.icon.update_menu = lambda: refreshes.append(native_update())
+        for _ in range(repeat):
+            app._update_menu()
+        time.sleep(LeanFocus.MENU_UPDATE_DELAY * 4)
+        app.quit_app()
+        result[str(size)] = {"items_evaluated": items, "burst_requests": repeat,
+                             "burst_refreshes": len(refreshes), **summarize(samples)}
+    return result
+
+
+def bench_procedural_noise(quick):
+    """内蔵ノイズ 1 ブロック（NoiseGenerator.BLOCK_SEC 秒分）の合成コスト"""
+    if not LeanFocus.NoiseGenerator.available():
+        return {"skipped": "numpy unavailable"}
+    app = new_app()
+    if not app._init_pygame():
+        app.quit_app()
+        return {"skipped": "mixer unavailable"}
+    repeat = 10 if quick else 50
+    result = {}
+    for color in LeanFocus.NoiseGenerator.COLORS:
+        generator = LeanFocus.NoiseGenerator(color, channel=None, scheduler=None)
+        samples = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            generator.synthesize()
+            samples.append(time.perf_counter() - t0)
+        stats = summarize(samples)
+        stats["cpu_percent"] = round(stats["mean_ms"] / (generator.BLOCK_SEC * 1000) * 100, 3)
+        result[color] = stats
+    app.quit_app()
+    return result
+
+
+def bench_overlay_compose(quick):
+    """画像レンダラーで1秒分の表示を作るコスト（グリフを作る初回 / キャッシュ済みの毎秒の更新）"""
+    try:
+        renderer = LeanFocus.OverlayImageRenderer(canvas=None, px_per_point=96 / 72)
+    except ImportError:
+        return {"skipped": "PIL unavailable"}
+    repeat = 300 if quick else 1500
+    text = LeanFocus.tr("status_fmt")
+    color = LeanFocus.FloatingTimer.COLOR_WORK
+
+    def frame(seconds):
+        items, right = renderer.layout_line(text.format(state="WORK", time=LeanFocus.format_time(seconds)),
+                                            renderer.pixels(24), color, 5, 5)
+        return renderer.compose(items, (right + 5, renderer.line_height(renderer.pixels(24)) + 10))
+
+    cold = []
+    for _ in range(10 if quick else 30):
+        renderer.clear()
+        t0 = time.perf_counter()
+        frame(LeanFocus.WORK_DURATION)
+        cold.append(time.perf_counter() - t0)
+    samples, sizes = [], set()
+    for seconds in range(repeat, 0, -1):
+        t0 = time.perf_counter()
+        image = frame(seconds)
+        samples.append(time.perf_counter() - t0)
+        sizes.add(image.size)
+    return {"cold": summarize(cold), "tick": summarize(samples), "distinct_sizes": len(sizes)}
+
+
+def bench_tray_frames(quick):
+    """トレイアイコンの進捗フレームを描くコスト（フェーズ開始時にまとめて / 分の境界での差し替え）"""
+    clock = LeanFocus.VirtualClock()
+    scheduler = LeanFocus.VirtualScheduler(clock)
+    engine = LeanFocus.TimerEngine(clock=clock, scheduler=scheduler)
+    icon = types.SimpleNamespace(icon=None)
+    tray = LeanFocus.TrayProgressIcon(icon, None, scheduler, engine)
+    try:
+        tray.render(False, engine.STATE_WORK, 0)  # フォントの読み込みは計測に含めない
+    except ImportError:
+        return {"skipped": "PIL unavailable"}
+    engine.events.subscribe(tray.on_timer_event, dispatch=scheduler.call_soon)
+    tray.set_enabled(True)
+    scheduler.advance(0)
+
+    phase_start = []
+    for _ in range(3 if quick else 10):
+        tray.frames.clear()
+        engine.reset_timer()
+        scheduler.advance(0)
+        t0 = time.perf_counter()
+        engine.start_pomodoro()
+        scheduler.advance(0)
+        phase_start.append(time.perf_counter() - t0)
+
+    swaps = []
+    for _ in range(LeanFocus.WORK_DURATION // 60 - 1):
+        t0 = time.perf_counter()
+        scheduler.advance(60)
+        swaps.append(time.perf_counter() - t0)
+    frame_bytes = LeanFocus.TrayProgressIcon.SIZE ** 2 * 4
+    return {"phase_start": summarize(phase_start), "minute_swap": summarize(swaps),
+            "frames_cached": len(tray.frames),
+            "cache_kib_max": LeanFocus.TrayProgressIcon.MAX_FRAMES * frame_bytes // 1024}
+
+
+def bench_control_fanout(quick):
+    """制御ソケットの購読者が多いときの待機中CPU時間と、状態変化が全員に届くまでの時間"""
+    import socket
+    subscribers = 50
+    duration = 3.0 if quick else 10.0
+    repeat = 20 if quick else 100
+    app = new_app()
+    address = os.path.abspath("control.sock") if hasattr(socket, "AF_UNIX") and sys.platform != "win32" else None
+    server = LeanFocus.ControlServer(app, address, token_path=os.path.abspath("control.token"))
+    app.control = server
+    server.start()
+    server.ready.wait()
+    if server.loop is None:
+        app.quit_app()
+        return {"skipped": "control socket unavailable"}
+    family = socket.AF_UNIX if isinstance(server.address, str) else socket.AF_INET
+    streams = []
+    for _ in range(subscribers):
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.connect(server.address)
+        sock.sendall(auth_line(server.token) + b"subscribe\n")
+        stream = sock.makefile("rb")
+        stream.readline()
+        streams.append((sock, stream))
+
+    result = {"subscribers": subscribers}
+    with idle_cpu(result, duration):
+        time.sleep(duration)
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        app.events.publish(app.events.latest)
+        for _, stream in streams:
+            stream.readline()
+        samples.append(time.perf_counter() - t0)
+    result["fanout"] = summarize(samples)
+    for sock, stream in streams:
+        stream.close()
+        sock.close()
+    app.quit_app()
+    return result
+
+
+BENCHMARKS = {
+    "timer_wakeups": bench_timer_wakeups,
+    "overlay_render": bench_overlay_render,
+    "opacity_preview": bench_opacity_preview,
+    "transition_latency": bench_transition_latency,
+    "scan_assets": bench_scan_assets,
+    "save_config": bench_save_config,
+    "update_menu": bench_update_menu,
+    "procedural_noise": bench_procedural_noise,
+    "overlay_compose": bench_overlay_compose,
+    "tray_frames": bench_tray_frames,
+    "control_fanout": bench_control_fanout,
+}
+
+
+# =========================================
+# 実行環境の準備
+# =========================================
+def setup_backends(force_stub):
+    """pygame / PIL は使えれば実物、pystray は常にスタブを使う"""
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    backends = {"pystray": "stub"}
+    stubs = {"pystray": True}
+    for module, key in (("pygame", "pygame"), ("PIL", "pil")):
+        real = False
+        if not force_stub:
+            try:
+                __import__(module)
+                real = True
+            except ImportError:
+                pass
+        stubs[key] = not real
+        backends[module] = "real" if real else "stub"
+    stub_backends.install(**stubs)
+    return backends
+
+
+def start_xvfb():
+    """DISPLAY が無い Linux では Xvfb を起動して Tk の計測を可能にする"""
+    if os.environ.get("DISPLAY") or not sys.platform.startswith("linux") or not shutil.which("Xvfb"):
+        return None
+    display = ":97"
+    proc = subprocess.Popen(["Xvfb", display, "-nolisten", "tcp"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    os.environ["DISPLAY"] = display
+    return proc
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    global LeanFocus
+    parser = argparse.ArgumentParser(description="LeanFocus hot-path benchmarks")
+    parser.add_argument("--quick", action="store_true", help="短時間版（各計測の時間・回数を減らす）")
+    parser.add_argument("--only", help="実行するベンチマーク名（カンマ区切り）: " + ",".join(BENCHMARKS))
+    parser.add_argument("--stub", action="store_true", help="pygame / PIL もスタブに置き換える")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="結果を追記する JSONL ファイル")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+
+    backends = setup_backends(args.stub)
+    xvfb = start_xvfb()
+    output = os.path.abspath(args.output)
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_rev": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "backends": backends,
+        "results": {},
+    }
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory(prefix="leanfocus_bench_") as workdir:
+            # 設定ファイルや assets は相対パスなので、作業ディレクトリごと隔離する
+            os.chdir(workdir)
+            import LeanFocus as module
+            LeanFocus = module
+            for name in names:
+                print(f"[{name}] ...", flush=True)
+                os.makedirs(name, exist_ok=True)
+                os.chdir(name)
+                try:
+                    record["results"][name] = BENCHMARKS[name](args.quick)
+                finally:
+                    os.chdir(workdir)
+                print(json.dumps(record["results"][name], indent=2), flush=True)
+            os.chdir(cwd)
+    finally:
+        os.chdir(cwd)
+        if xvfb:
+            xvfb.terminate()
+
+    with open(output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    print(f"results appended to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+ベンチマーク用のスタブバックエンド。
+pygame / pystray / PIL の代わりに sys.modules へ登録し、ヘッドレスな Linux でも
+LeanFocus の Python 側の処理だけを計測できるようにする。
+"""
+
+import sys
+import time
+import types
+
+# スタブの Channel.play / music.play が呼ばれた時刻 (time.time()) の記録先
+PLAY_LOG = []
+
+
+def _make_pygame():
+    pygame = types.ModuleType("pygame")
+    mixer = types.ModuleType("pygame.mixer")
+    music = types.ModuleType("pygame.mixer.music")
+
+    class error(Exception):
+        pass
+
+    class Sound:
+        def __init__(self, file=None, buffer=None):
+            self._length = 1.0
+
+        def get_length(self):
+            return self._length
+
+        def set_volume(self, volume):
+            pass
+
+    class Channel:
+        def __init__(self, index):
+            self.index = index
+            self._sound = None
+
+        def play(self, sound, loops=0, maxtime=0, fade_ms=0):
+            PLAY_LOG.append(time.time())
+            self._sound = sound
+
+        def stop(self):
+            self._sound = None
+
+        def fadeout(self, ms):
+            self._sound = None
+
+        def set_volume(self, *volume):
+            pass
+
+        def get_busy(self):
+            return self._sound is not None
+
+    def _music_play(loops=0, start=0.0, fade_ms=0):
+        PLAY_LOG.append(time.time())
+
+    for name in ("load", "stop", "fadeout", "set_volume", "pause", "unpause"):
+        setattr(music, name, lambda *args, **kwargs: None)
+    music.play = _music_play
+    music.get_busy = lambda: False
+
+    mixer.music = music
+    mixer.Sound = Sound
+    mixer.Channel = Channel
+    mixer.init = lambda *args, **kwargs: None
+    mixer.pre_init = lambda *args, **kwargs: None
+    mixer.quit = lambda: None
+    mixer.get_init = lambda: (44100, -16, 2)
+    mixer.set_reserved = lambda count: count
+    mixer.set_num_channels = lambda count: None
+    mixer.get_num_channels = lambda: 8
+
+    pygame.error = error
+    pygame.mixer = mixer
+    return {"pygame": pygame, "pygame.mixer": mixer, "pygame.mixer.music": music}
+
+
+def _make_pystray():
+    pystray = types.ModuleType("pystray")
+
+    class MenuItem:
+        def __init__(self, text, action, checked=None, radio=False, default=False, visible=True, enabled=True):
+            self._text = text
+            self.action = action
+            self._checked = checked
+            self.radio = radio
+            self.default = default
+            self._enabled = enabled
+
+        @property
+        def text(self):
+            return self._text(self) if callable(self._text) else self._text
+
+        @property
+        def checked(self):
+            return self._checked(self) if callable(self._checked) else self._checked
+
+        @property
+        def enabled(self):
+            return self._enabled(self) if callable(self._enabled) else self._enabled
+
+        @property
+        def submenu(self):
+            return self.action if isinstance(self.action, Menu) else None
+
+    class Menu:
+        SEPARATOR = MenuItem("- - - -", None)
+
+        def __init__(self, *items):
+            # pystray と同様、引数が呼び出し可能オブジェクト1つなら表示のたびに評価する
+            if len(items) == 1 and callable(items[0]) and not isinstance(items[0], MenuItem):
+                self._items = items[0]
+            else:
+                self._items = tuple(items)
+
+        @property
+        def items(self):
+            return tuple(self._items()) if callable(self._items) else self._items
+
+    class Icon:
+        def __init__(self, name, icon=None, title=None, menu=None):
+            self.name = name
+            self.icon = icon
+            self.title = title
+            self.menu = menu
+            self.visible = False
+
+        def _walk(self, menu):
+            # pystray の各バックエンドが update_menu で行うのと同じく、全項目の表示内容を評価する
+            count = 0
+            for item in menu.items:
+                item.text, item.checked, item.enabled
+                count += 1
+                if item.submenu is not None:
+                    count += self._walk(item.submenu)
+            return count
+
+        def update_menu(self):
+            if self.menu is not None:
+                return self._walk(self.menu)
+            return 0
+
+        def run(self, setup=None):
+            if setup:
+                setup(self)
+
+        def stop(self):
+            self.visible = False
+
+    pystray.MenuItem = MenuItem
+    pystray.Menu = Menu
+    pystray.Icon = Icon
+    return {"pystray": pystray}
+
+
+def _make_pil():
+    pil = types.ModuleType("PIL")
+    image = types.ModuleType("PIL.Image")
+
+    class _Image:
+        def __init__(self, mode, size, color=None):
+            self.mode = mode
+            self.size = size
+
+    def _open(path):
+        raise OSError("stub backend")
+
+    image.open = _open
+    image.new = lambda mode, size, color=None: _Image(mode, size, color)
+    image.Image = _Image
+    pil.Image = image
+    return {"PIL": pil, "PIL.Image": image}
+
+
+def install(pygame=True, pystray=True, pil=True):
+    """指定したバックエンドのスタブを sys.modules に登録する"""
+    modules = {}
+    if pygame: modules.update(_make_pygame())
+    if pystray: modules.update(_make_pystray())
+    if pil: modules.update(_make_pil())
+    sys.modules.update(modules)
+    return sorted(name for name in modules if "." not in name)
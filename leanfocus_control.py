@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+LeanFocus の制御ソケットの取り決め（アドレス・認証トークン・コマンド）と表示用の小さな関数。
+本体 (LeanFocus.py) と制御クライアント (leanfocusctl.py) の両方から読み込む。
+クライアントが tkinter などの GUI の初期化を読み込まずに済むよう、標準ライブラリ以外には依存しない。
+"""
+
+import os
+import socket
+import sys
+import tempfile
+
+CONTROL_PORT = 47825  # AF_UNIX が使えない環境で制御ソケットが待ち受ける localhost のポート
+AUTH_COMMAND = "auth"  # 接続して最初に送る行: "auth <トークン>"
+
+# タイマーを操作するコマンド -> PomodoroTimer のメソッド名
+COMMANDS = {"start": "start_pomodoro", "stop": "stop_pomodoro",
+            "reset": "reset_timer", "restart": "restart_and_pause"}
+
+
+def _use_unix_socket() -> bool:
+    return sys.platform != "win32" and hasattr(socket, "AF_UNIX")
+
+
+def control_address():
+    """制御ソケットのアドレス。POSIX ではユーザーごとのソケットファイル、Windows では localhost の TCP"""
+    if _use_unix_socket():
+        base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+        return os.path.join(base, f"LeanFocus-{os.getuid()}.sock")
+    return ("127.0.0.1", CONTROL_PORT)
+
+
+def control_token_path():
+    """
+    起動ごとの認証トークンを置くファイル。ファイル自体は本人だけが読める権限で作る。
+    Windows の一時フォルダはユーザーごと (%LOCALAPPDATA%\\Temp) で、他のユーザーからは読めない。
+    """
+    if _use_unix_socket():
+        base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+        return os.path.join(base, f"LeanFocus-{os.getuid()}.token")
+    return os.path.join(tempfile.gettempdir(), "LeanFocus-control.token")
+
+
+def read_token(path=None) -> str:
+    """起動中の LeanFocus が書いたトークンを読む（無ければ OSError）"""
+    with open(path or control_token_path(), encoding="ascii") as f:
+        return f.read().strip()
+
+
+def auth_line(token) -> bytes:
+    return f"{AUTH_COMMAND} {token}\n".encode("ascii")
+
+
+def format_time(seconds):
+    """秒数を "MM:SS" 形式にする"""
+    mins, secs = divmod(max(0, seconds), 60)
+    return f"{mins:02d}:{secs:02d}"
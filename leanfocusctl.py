@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+起動中の LeanFocus を制御ソケット経由で操作する小さなクライアント。
+
+    python leanfocusctl.py status       # 現在の状態を JSON で表示
+    python leanfocusctl.py start        # start / stop / reset / restart
+    python leanfocusctl.py subscribe    # 状態が変わるたびに JSON を1行ずつ表示
+    python leanfocusctl.py watch        # 残り時間を1秒ごとに表示（計算は手元で行う）
+"""
+
+import argparse
+import json
+import math
+import socket
+import sys
+import time
+
+from leanfocus_control import COMMANDS, auth_line, control_address, format_time, read_token
+
+
+def connect(address=None, token_path=None):
+    """制御ソケットにつなぎ、起動中の LeanFocus が書いたトークンで認証する"""
+    token = read_token(token_path)
+    address = address or control_address()
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.connect(address)
+    sock.sendall(auth_line(token))
+    return sock
+
+
+def request(sock, command):
+    """コマンドを送り、応答を1行読む"""
+    sock.sendall((command + "\n").encode("utf-8"))
+    return json.loads(sock.makefile("r", encoding="utf-8").readline())
+
+
+def watch(sock):
+    """状態を購読し、次の期限までの残り時間を手元の時計で数えて表示する"""
+    sock.sendall(b"subscribe\n")
+    buffer = b""
+    state = None
+    while True:
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            state = json.loads(line)
+        if state is None:
+            timeout = None
+        elif state["deadline"] is None:
+            print(f"{state['state']} {format_time(state['remaining'])}", flush=True)
+            timeout = None
+        else:
+            remaining = max(0.0, state["deadline"] - time.time())
+            print(f"{state['state']} {format_time(math.ceil(remaining))}", flush=True)
+            # 表示が次に変わる時刻まで待つ。その間に状態が届けば即座に切り替える
+            timeout = remaining % 1.0 or 1.0
+        sock.settimeout(timeout)
+        try:
+            chunk = sock.recv(4096)
+        except socket.timeout:
+            continue
+        if not chunk: return
+        buffer += chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LeanFocus control client")
+    parser.add_argument("command", choices=sorted(COMMANDS) + ["status", "subscribe", "watch"])
+    args = parser.parse_args()
+
+    try:
+        sock = connect()
+    except OSError as e:
+        sys.exit(f"LeanFocus is not running ({e})")
+    try:
+        if args.command == "watch":
+            watch(sock)
+        elif args.command == "subscribe":
+            sock.sendall(b"subscribe\n")
+            for line in sock.makefile("r", encoding="utf-8"):
+                print(line, end="", flush=True)
+        else:
+            print(json.dumps(request(sock, args.command)))
+    except KeyboardInterrupt: pass
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+TimerEngine の回帰テスト。
+VirtualClock と VirtualScheduler で動かすので、実時間を待たずにフェーズの切り替えや
+スリープ復帰（期限を大きく過ぎてからの起床）を再現できる。
+"""
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LeanFocus import (SUSPEND_GAP_THRESHOLD, EventBus, TimerEngine,  # noqa: E402
+                       VirtualClock, VirtualScheduler)
+
+WORK = 25 * 60
+BREAK = 5 * 60
+
+
+class RecordingHistory:
+    """log_event() の呼び出しを (イベント, フェーズ) の一覧として残す"""
+    def __init__(self):
+        self.events = []
+
+    def log_event(self, event, phase, value=0.0):
+        self.events.append((event, phase))
+
+
+class TimerEngineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = VirtualClock(start=1000.0)
+        self.scheduler = VirtualScheduler(self.clock)
+        self.events = EventBus()
+        self.history = RecordingHistory()
+        self.snapshots = []
+        self.events.subscribe(self.snapshots.append)
+        self.engine = self.make_engine()
+
+    def make_engine(self, suspend_policy="catch_up"):
+        return TimerEngine(clock=self.clock, scheduler=self.scheduler, events=self.events, history=self.history,
+                           work_duration=WORK, break_duration=BREAK, suspend_policy=suspend_policy)
+
+    def sleep(self, seconds):
+        """スリープを再現する。時計だけ進め、期限の来た予約は起床後にまとめて実行される"""
+        self.clock.now += seconds
+        self.scheduler.advance(0)
+
+
+class TestTransitions(TimerEngineTestCase):
+    def test_start_runs_work_then_break_then_work(self):
+        self.engine.start_pomodoro()
+        self.assertEqual(self.engine.state, TimerEngine.STATE_WORK)
+        self.assertEqual(self.engine.remaining_time, WORK)
+
+        self.scheduler.advance(WORK - 1)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_WORK)
+        self.assertEqual(self.engine.remaining_time, 1)
+
+        self.scheduler.advance(1)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_BREAK)
+        self.assertEqual(self.engine.remaining_time, BREAK)
+
+        self.scheduler.advance(BREAK)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_WORK)
+        self.assertEqual(self.history.events,
+                         [("start", "WORK"), ("complete", "WORK"), ("complete", "BREAK")])
+
+    def test_deadlines_do_not_drift_over_many_cycles(self):
+        self.engine.start_pomodoro()
+        started = self.clock.now
+        self.scheduler.advance(100 * (WORK + BREAK))
+        self.assertEqual(self.engine.state, TimerEngine.STATE_WORK)
+        self.assertEqual(self.engine.end_time, started + 100 * (WORK + BREAK) + WORK)
+
+    def test_pause_freezes_remaining_time_and_resume_continues(self):
+        self.engine.start_pomodoro()
+        self.scheduler.advance(100)
+        self.engine.stop_pomodoro()
+        self.assertEqual(self.engine.state, TimerEngine.STATE_PAUSED)
+        self.assertEqual(self.engine.resume_state, TimerEngine.STATE_WORK)
+
+        self.scheduler.advance(3600)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_PAUSED)
+        self.assertEqual(self.engine.remaining_time, WORK - 100)
+
+        self.engine.start_pomodoro()
+        self.scheduler.advance(WORK - 100)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_BREAK)
+        self.assertEqual(self.history.events,
+                         [("start", "WORK"), ("pause", "WORK"), ("resume", "WORK"), ("complete", "WORK")])
+
+    def test_reset_stops_and_cancels_the_deadline(self):
+        self.engine.start_pomodoro()
+        self.scheduler.advance(100)
+        self.engine.reset_timer()
+        self.scheduler.advance(WORK + BREAK)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_STOPPED)
+        self.assertEqual(self.engine.remaining_time, WORK)
+        self.assertEqual(self.history.events, [("start", "WORK"), ("reset", "WORK")])
+
+    def test_restart_and_pause_rewinds_the_current_phase(self):
+        self.engine.start_pomodoro()
+        self.scheduler.advance(WORK + 60)
+        self.engine.restart_and_pause()
+        self.assertEqual(self.engine.state, TimerEngine.STATE_PAUSED)
+        self.assertEqual(self.engine.resume_state, TimerEngine.STATE_BREAK)
+        self.assertEqual(self.engine.remaining_time, BREAK)
+
+    def test_snapshots_are_published_in_order(self):
+        self.engine.start_pomodoro()
+        self.scheduler.advance(WORK)
+        self.engine.stop_pomodoro()
+        versions = [s.version for s in self.snapshots]
+        self.assertEqual(versions, sorted(versions))
+        self.assertEqual([s.state for s in self.snapshots], ["STOP", "WORK", "BREAK", "PAUSE"])
+        # フェーズの期限による切り替えだけが transition（クロスフェードの対象）
+        self.assertEqual([s.transition for s in self.snapshots], [False, False, True, False])
+        self.assertIs(self.events.latest, self.snapshots[-1])
+        self.assertIsNone(self.events.latest.deadline)
+
+    def test_subscriber_may_wait_for_a_thread_that_uses_the_engine(self):
+        # Tk の after() のように、購読者が別スレッドの処理を待っても止まらないこと
+        def pause_from_other_thread(callback, snapshot):
+            callback(snapshot)
+            if snapshot.state == TimerEngine.STATE_WORK:
+                worker = threading.Thread(target=self.engine.stop_pomodoro)
+                worker.start()
+                worker.join(timeout=2)
+                self.assertFalse(worker.is_alive())
+
+        self.events.subscribe(lambda snapshot: None, dispatch=pause_from_other_thread)
+        self.engine.start_pomodoro()
+        self.assertEqual([s.state for s in self.snapshots], ["STOP", "WORK", "PAUSE"])
+        self.assertEqual(self.events.latest.state, TimerEngine.STATE_PAUSED)
+
+
+class TestSuspendGap(TimerEngineTestCase):
+    def test_small_overrun_is_a_normal_transition(self):
+        self.engine.start_pomodoro()
+        started = self.clock.now
+        self.sleep(WORK + SUSPEND_GAP_THRESHOLD / 2)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_BREAK)
+        # 遅れて起きても次の期限は前の期限から数える
+        self.assertEqual(self.engine.end_time, started + WORK + BREAK)
+
+    def test_catch_up_jumps_to_the_current_phase(self):
+        self.engine.start_pomodoro()
+        # 作業の期限から 休憩 + 160 秒後に復帰 → 次の作業の 160 秒目
+        self.sleep(WORK + BREAK + 160)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_WORK)
+        self.assertEqual(self.engine.remaining_time, WORK - 160)
+        self.assertEqual(self.history.events,
+                         [("start", "WORK"), ("complete", "WORK"), ("complete", "BREAK")])
+        self.assertTrue(self.events.latest.transition)
+
+        self.scheduler.advance(WORK - 160)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_BREAK)
+
+    def test_catch_up_wraps_long_gaps_by_cycle(self):
+        self.engine.start_pomodoro()
+        self.sleep(WORK + 10 * (WORK + BREAK) + 60)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_BREAK)
+        self.assertEqual(self.engine.remaining_time, BREAK - 60)
+
+    def test_pause_policy_stops_at_the_start_of_the_next_phase(self):
+        self.engine = self.make_engine(suspend_policy="pause")
+        self.engine.start_pomodoro()
+        self.sleep(WORK + 3 * 3600)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_PAUSED)
+        self.assertEqual(self.engine.resume_state, TimerEngine.STATE_BREAK)
+        self.assertEqual(self.engine.remaining_time, BREAK)
+        self.assertEqual(self.history.events, [("start", "WORK"), ("complete", "WORK"), ("pause", "BREAK")])
+
+        self.scheduler.advance(3600)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_PAUSED)
+
+
+class TestRestore(TimerEngineTestCase):
+    def test_running_phase_resumes_with_the_saved_deadline(self):
+        self.engine.restore("WORK", "WORK", 0, until_deadline=600)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_WORK)
+        self.assertEqual(self.engine.remaining_time, 600)
+        self.scheduler.advance(600)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_BREAK)
+
+    def test_recently_overdue_phase_catches_up_without_history(self):
+        self.engine.restore("WORK", "WORK", 0, until_deadline=-60)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_BREAK)
+        self.assertEqual(self.engine.remaining_time, BREAK - 60)
+        self.assertEqual(self.history.events, [])
+
+    def test_stale_checkpoint_is_discarded(self):
+        self.engine.restore("WORK", "WORK", 0, until_deadline=-(WORK + BREAK + 1))
+        self.assertEqual(self.engine.state, TimerEngine.STATE_STOPPED)
+        self.assertEqual(self.history.events, [])
+
+    def test_paused_phase_clamps_remaining_time(self):
+        self.engine.restore("PAUSE", "BREAK", 10 ** 6)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_PAUSED)
+        self.assertEqual(self.engine.resume_state, TimerEngine.STATE_BREAK)
+        self.assertEqual(self.engine.remaining_time, BREAK)
+
+    def test_restore_is_ignored_while_running(self):
+        self.engine.start_pomodoro()
+        self.engine.restore("BREAK", "BREAK", 0, until_deadline=10)
+        self.assertEqual(self.engine.state, TimerEngine.STATE_WORK)
+
+
+if __name__ == "__main__":
+    unittest.main()